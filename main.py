@@ -1,17 +1,36 @@
 import streamlit as st
 import pandas as pd
+import os
 from datetime import datetime
 import plotly.express as px
 
-from utils.sms_processor import process_sms_data
-from utils.transaction_categorizer import categorize_transactions
-from utils.data_manager import load_data, save_data
+from utils.ingestion_jobs import IngestionManager
+from utils.sms_prefilter import load_prefilter
+from utils.data_manager import (
+    export_to_temp_file,
+    discard_export,
+    EXPORT_EXTENSIONS,
+    EXPORT_MIME_TYPES,
+    COMPRESSION_EXTENSIONS
+)
+from utils.transaction_store import TransactionStore, get_shared_store
+from utils.reparse import plan_reparse, reparse_store
+from utils.anomaly_detector import load_detector
+from utils.obligations import load_obligations
 from utils.visualization import create_cashflow_chart, create_investment_chart
 from utils.notification import check_upcoming_bills
+from utils.notification_dispatcher import (
+    NotificationDispatcher,
+    StubTransport,
+    TwilioTransport,
+    collect_bill_events,
+    collect_anomaly_events
+)
 from utils.financial_analytics import (
     analyze_spending_patterns,
     get_budget_recommendations,
-    generate_financial_insights
+    generate_financial_insights,
+    APPROXIMATE_ANALYTICS_ROWS
 )
 
 # Page configuration
@@ -21,78 +40,269 @@ st.set_page_config(
     layout="wide"
 )
 
-# Initialize session state
-if 'transactions' not in st.session_state:
-    st.session_state.transactions = load_data()
+# Process-wide resources shared by every session
+@st.cache_resource
+def get_store() -> TransactionStore:
+    """
+    Process-wide transaction store shared read-only by all sessions
+    """
+    return get_shared_store()
+
+@st.cache_resource
+def get_anomaly_detector():
+    """
+    Process-wide anomaly detector, built from the stored history on first use
+    """
+    return load_detector(get_store().data)
+
+@st.cache_resource
+def get_obligations():
+    """
+    Process-wide loan/policy index, extracted from the stored history on first use
+    """
+    return load_obligations(get_store().data)
+
+store = get_store()
+if 'anomalies' not in st.session_state:
+    st.session_state.anomalies = []
+
+@st.cache_resource
+def get_notification_dispatcher() -> NotificationDispatcher:
+    """
+    Process-wide dispatcher shared by all sessions; falls back to a local stub sink
+    """
+    dispatcher = NotificationDispatcher(TwilioTransport.from_env() or StubTransport())
+    dispatcher.start()
+    return dispatcher
+
+@st.cache_resource
+def get_ingestion_manager() -> IngestionManager:
+    """
+    Process-wide worker pool for parsing uploads
+    """
+    return IngestionManager(get_store(), get_anomaly_detector(), obligations=get_obligations())
+
+def discard_session_export() -> None:
+    """
+    Remove this session's prepared export file once it has been downloaded or replaced
+    """
+    discard_export(st.session_state.get('export_path'))
+    st.session_state.export_path = None
 
 # Main title
 st.title("Financial SMS Tracker")
 
 # Sidebar
 st.sidebar.header("Data Import")
-uploaded_file = st.sidebar.file_uploader("Upload SMS Data (CSV)", type=['csv'])
+uploaded_file = st.sidebar.file_uploader(
+    "Upload SMS Data (CSV or Android XML backup)",
+    type=['csv', 'xml']
+)
 
-if uploaded_file is not None:
-    # Load and display raw data structure
-    df = pd.read_csv(uploaded_file)
-    st.sidebar.write("CSV Columns:", df.columns.tolist())
+use_prefilter = st.sidebar.checkbox("Skip non-financial SMS (OTPs, promos)", value=False)
+prefilter = None
+if use_prefilter:
+    prefilter = load_prefilter()
+    # Defaults to the threshold tuned for recall when the model was trained
+    prefilter.threshold = st.sidebar.slider("Prefilter threshold", 0.0, 1.0, float(prefilter.threshold), 0.01)
 
-    # Display sample data
-    with st.expander("Preview Raw Data"):
-        st.write("First few rows of uploaded data:", df.head())
+if 'jobs' not in st.session_state:
+    st.session_state.jobs = []
+    st.session_state.submitted_files = set()
 
+if uploaded_file is not None and uploaded_file.file_id not in st.session_state.submitted_files:
     try:
-        # Process new SMS data
-        processed_data = process_sms_data(df)
-        categorized_data = categorize_transactions(processed_data)
-
-        # Update session state
-        st.session_state.transactions = pd.concat([st.session_state.transactions, categorized_data])
-        save_data(st.session_state.transactions)
-        st.sidebar.success("Data processed successfully!")
+        # Parse in the background so the dashboard stays interactive
+        job_id = get_ingestion_manager().submit(
+            uploaded_file.name, uploaded_file.getvalue(), prefilter=prefilter
+        )
+        st.session_state.jobs.append(job_id)
+        st.session_state.submitted_files.add(uploaded_file.file_id)
     except Exception as e:
         st.error(f"Error processing data: {str(e)}")
 
+@st.fragment(run_every=1.0)
+def show_ingestion_jobs() -> None:
+    """
+    Live progress for this session's uploads; reruns the app when one finishes
+    """
+    manager = get_ingestion_manager()
+    for job_id in list(st.session_state.jobs):
+        job = manager.get(job_id)
+        if job is None:
+            continue
+        progress = job.progress()
+
+        if not job.done:
+            eta = f", ETA {progress['eta_seconds']:.0f}s" if progress['eta_seconds'] is not None else ""
+            st.progress(
+                progress['fraction'],
+                text=f"{job.filename}: {progress['rows_read']} rows "
+                     f"({progress['rows_per_sec']:.0f} rows/s{eta})"
+            )
+            if st.button("Cancel", key=f"cancel_{job_id}"):
+                manager.cancel(job_id)
+            continue
+
+        # Finished: collect it from the manager, then refresh the whole page to pick up the new snapshot
+        st.session_state.jobs.remove(job_id)
+        st.session_state.finished_jobs = st.session_state.get('finished_jobs', []) + [manager.pop(job_id)]
+        if job.status == 'completed':
+            st.session_state.anomalies = job.anomalies
+        st.rerun()
+
+if st.session_state.jobs:
+    with st.sidebar:
+        show_ingestion_jobs()
+
+# Each finished upload is reported on the run after it completes, then dropped
+for job in st.session_state.pop('finished_jobs', []):
+    if job.preview is not None:
+        st.sidebar.write("Columns:", job.columns)
+        with st.expander(f"Preview Raw Data ({job.filename})"):
+            st.write("First few rows of uploaded data:", job.preview)
+    if job.status == 'completed':
+        st.sidebar.success(f"{job.filename}: {job.rows_parsed} transactions processed successfully!")
+        if job.duplicates:
+            st.sidebar.info(f"Flagged {job.duplicates} duplicate alert(s) for the same payment")
+        if job.coverage is not None:
+            with st.sidebar.expander("Parser coverage by sender"):
+                st.dataframe(job.coverage, use_container_width=True)
+        for warning in job.warnings:
+            st.sidebar.warning(f"{job.filename}: {warning}")
+    elif job.status == 'cancelled':
+        st.sidebar.warning(f"{job.filename}: import cancelled")
+    else:
+        st.error(f"Error processing data: {job.error}")
+
+# Stored rows parsed with older patterns are re-parsed through the shared store,
+# so uploads merged meanwhile are kept
+stale = plan_reparse(store.data)
+stale_rows = int((stale['extract'] | stale['sms_categories'] | stale['categories']).sum())
+if stale_rows and st.sidebar.button(f"Re-parse stored messages ({stale_rows} parsed with older patterns)"):
+    with st.spinner("Re-parsing stored messages..."):
+        reparse_stats = reparse_store(store)
+    st.sidebar.success(f"Re-parsed {reparse_stats['extracted']} message(s); "
+                       f"{reparse_stats['unparsed']} no longer parse and were kept as they were")
+
+# One consistent snapshot of the shared store for the rest of this run
+snapshot = store.snapshot()
+transactions = snapshot.data
+
 # Main dashboard
 col1, col2 = st.columns(2)
 
 with col1:
     st.subheader("Cash Flow Analysis")
-    if not st.session_state.transactions.empty:
-        cashflow_chart = create_cashflow_chart(st.session_state.transactions)
+    if not transactions.empty:
+        cashflow_chart = create_cashflow_chart(transactions)
         st.plotly_chart(cashflow_chart, use_container_width=True)
     else:
         st.info("Upload SMS data to view cash flow analysis")
 
 with col2:
     st.subheader("Investment Portfolio")
-    if not st.session_state.transactions.empty:
-        investment_chart = create_investment_chart(st.session_state.transactions)
+    if not transactions.empty:
+        investment_chart = create_investment_chart(transactions)
         st.plotly_chart(investment_chart, use_container_width=True)
     else:
         st.info("Upload SMS data to view investment analysis")
 
 # Transaction list
 st.subheader("Recent Transactions")
-if not st.session_state.transactions.empty:
+if not transactions.empty:
+    page_size = 10
+    filter_col, page_col = st.columns([3, 1])
+    with filter_col:
+        type_filter = st.multiselect(
+            "Transaction type",
+            options=['debit', 'credit', 'unknown']
+        )
+    with page_col:
+        page = st.number_input("Page", min_value=1, value=1, step=1)
+
     st.dataframe(
-        st.session_state.transactions.sort_values('date', ascending=False).head(10),
+        snapshot.recent(
+            offset=(page - 1) * page_size,
+            limit=page_size,
+            filters={'type': type_filter} if type_filter else None
+        ),
         use_container_width=True
     )
 else:
     st.info("No transactions to display")
 
+# Period summary
+st.subheader("Period Summary")
+if not transactions.empty:
+    engine = snapshot.range_queries()
+    if engine.min_date is not None:
+        period = st.date_input(
+            "Date range",
+            value=(engine.min_date.date(), engine.max_date.date()),
+            min_value=engine.min_date.date(),
+            max_value=engine.max_date.date()
+        )
+        if isinstance(period, (list, tuple)) and len(period) == 2:
+            start = pd.Timestamp(period[0])
+            end = pd.Timestamp(period[1]) + pd.Timedelta(days=1)
+            spent = engine.query(start, end, type='debit')
+            received = engine.query(start, end, type='credit')
+
+            cols = st.columns(3)
+            cols[0].metric("Spent", f"₹{spent['total']:.2f}", f"{spent['count']} debits")
+            cols[1].metric("Received", f"₹{received['total']:.2f}", f"{received['count']} credits")
+            cols[2].metric("Average Debit", f"₹{spent['mean']:.2f}")
+else:
+    st.info("Upload SMS data to view period summaries")
+
+# Account balances reported by the banks
+st.subheader("Account Balances")
+ledger = snapshot.balance_ledger() if not transactions.empty else None
+if ledger is not None and ledger.accounts:
+    balances_series = ledger.series()
+    as_of = st.date_input(
+        "Balances as of",
+        value=balances_series['date'].max().date(),
+        key="balances_as_of"
+    )
+    balances = ledger.balances_as_of(pd.Timestamp(as_of) + pd.Timedelta(days=1) - pd.Timedelta(microseconds=1))
+
+    cols = st.columns(len(balances) + 1)
+    cols[0].metric("Total", f"₹{sum(balances.values()):.2f}")
+    for col, (account, balance) in zip(cols[1:], balances.items()):
+        col.metric(f"A/c {account}", f"₹{balance:.2f}")
+
+    fig = px.line(balances_series, x='date', y='balance', color='account_number',
+                  title="Reported Balance by Account")
+    st.plotly_chart(fig, use_container_width=True)
+
+    reconciliation = ledger.reconcile()
+    mismatches = reconciliation[~reconciliation['reconciled']]
+    if not mismatches.empty:
+        with st.expander(f"{len(mismatches)} balance changes not explained by parsed transactions"):
+            st.dataframe(mismatches, use_container_width=True)
+else:
+    st.info("No reported balances found yet")
+
 # Financial Analytics Section
 st.header("Financial Analytics & Insights")
 
-if not st.session_state.transactions.empty:
+if not transactions.empty:
     # Create tabs for different analytics views
     analytics_tab, insights_tab, budget_tab = st.tabs([
         "Spending Analytics", "Financial Insights", "Budget Recommendations"
     ])
 
     with analytics_tab:
-        patterns = analyze_spending_patterns(st.session_state.transactions)
+        # Very large histories are summarized from per-month sketches
+        approximate = len(snapshot) > APPROXIMATE_ANALYTICS_ROWS
+        patterns = analyze_spending_patterns(
+            transactions,
+            sketches=snapshot.spending_sketches() if approximate else None
+        )
+        if approximate:
+            st.caption("Approximate analytics: amount quantiles within 1%, distinct counts within ~2%")
 
         if patterns:
             # Account Overview
@@ -146,6 +356,18 @@ if not st.session_state.transactions.empty:
                     )
                     st.plotly_chart(fig, use_container_width=True)
 
+            # Unusual amounts in the latest upload, by category/account/merchant
+            if st.session_state.anomalies:
+                st.subheader("Unusual New Transactions")
+                for tx in st.session_state.anomalies:
+                    groups = ', '.join(
+                        f"{dim} ({z:.1f}σ)" for dim, z in tx['scores'].items()
+                    )
+                    st.warning(
+                        f"Unusual amount (₹{tx['amount']:.2f}) on {tx['date']} "
+                        f"for {tx['description']} - unusual for {groups}"
+                    )
+
             # Unusual Transactions
             if patterns.get('unusual_transactions'):
                 st.subheader("Unusual Transactions")
@@ -156,10 +378,13 @@ if not st.session_state.transactions.empty:
                     )
 
     with insights_tab:
-        insights = generate_financial_insights(st.session_state.transactions)
+        insights = generate_financial_insights(
+            transactions,
+            engine=snapshot.range_queries()
+        )
 
         # Group insights by account
-        for account in st.session_state.transactions['account_type'].unique():
+        for account in transactions['account_type'].unique():
             st.subheader(f"📊 {account} Insights")
             account_insights = [i for i in insights if i.get('account') == account]
 
@@ -181,7 +406,7 @@ if not st.session_state.transactions.empty:
                             st.metric(cat, f"₹{amount:.2f}")
 
     with budget_tab:
-        recommendations = get_budget_recommendations(st.session_state.transactions)
+        recommendations = get_budget_recommendations(transactions)
 
         st.subheader("📊 Recommended Monthly Budgets")
         st.write("Based on your historical spending patterns")
@@ -214,8 +439,9 @@ else:
 
 # Upcoming bills
 st.subheader("Upcoming Bills & Obligations")
-if not st.session_state.transactions.empty:
-    upcoming_bills = check_upcoming_bills(st.session_state.transactions)
+if not transactions.empty:
+    obligations = get_obligations().index()
+    upcoming_bills = check_upcoming_bills(transactions, obligations)
     if upcoming_bills:
         for bill in upcoming_bills:
             st.warning(
@@ -224,10 +450,81 @@ if not st.session_state.transactions.empty:
             )
     else:
         st.info("No upcoming bills detected")
+
+    overdue = obligations.overdue()
+    if not overdue.empty:
+        with st.expander(f"{len(overdue)} overdue loan(s)/policies"):
+            st.dataframe(overdue, use_container_width=True)
+
+    recipient = st.text_input("Phone number for SMS reminders")
+    if st.button("Send Reminders") and recipient:
+        events = collect_bill_events(recipient, recipient, transactions, obligations)
+        events += collect_anomaly_events(recipient, recipient, st.session_state.anomalies)
+        get_notification_dispatcher().submit(events)
+        st.success(f"Queued {len(events)} reminder(s) for delivery")
 else:
     st.info("Upload SMS data to view upcoming bills")
 
 # Export data
-if st.button("Export Data") and not st.session_state.transactions.empty:
-    st.session_state.transactions.to_csv("financial_data_export.csv", index=False)
-    st.success("Data exported successfully!")
\ No newline at end of file
+st.subheader("Export Data")
+if not transactions.empty:
+    format_col, compression_col, columns_col = st.columns([1, 1, 2])
+    with format_col:
+        export_format = st.selectbox("Format", ['csv', 'jsonl', 'parquet', 'json'])
+    with compression_col:
+        export_compression = st.selectbox(
+            "Compression",
+            [None, 'gzip', 'zstd'],
+            format_func=lambda c: c or 'none'
+        )
+    with columns_col:
+        export_columns = st.multiselect(
+            "Columns (all if empty)",
+            options=list(transactions.columns)
+        )
+
+    export_start = export_end = None
+    engine = snapshot.range_queries()
+    if engine.min_date is not None:
+        export_period = st.date_input(
+            "Export date range",
+            value=(engine.min_date.date(), engine.max_date.date()),
+            min_value=engine.min_date.date(),
+            max_value=engine.max_date.date(),
+            key="export_period"
+        )
+        if isinstance(export_period, (list, tuple)) and len(export_period) == 2:
+            export_start = pd.Timestamp(export_period[0])
+            export_end = pd.Timestamp(export_period[1]) + pd.Timedelta(days=1)
+
+    if st.button("Prepare Export"):
+        try:
+            # Only the path is kept across reruns; the previous export is no longer needed
+            discard_session_export()
+            st.session_state.export_path = export_to_temp_file(
+                transactions,
+                format=export_format,
+                compression=export_compression,
+                start=export_start,
+                end=export_end,
+                columns=export_columns or None
+            )
+            suffix = COMPRESSION_EXTENSIONS[export_compression] if export_format != 'parquet' else ''
+            st.session_state.export_name = f"financial_data_export.{EXPORT_EXTENSIONS[export_format]}{suffix}"
+            st.session_state.export_mime = EXPORT_MIME_TYPES[export_format]
+        except ValueError as e:
+            st.error(f"Error exporting data: {str(e)}")
+
+    export_path = st.session_state.get('export_path')
+    if export_path is not None and os.path.exists(export_path):
+        # Opened only for this render and closed once the button has read it
+        with open(export_path, 'rb') as export_file:
+            st.download_button(
+                "Download Export",
+                data=export_file,
+                file_name=st.session_state.export_name,
+                mime=st.session_state.export_mime,
+                on_click=discard_session_export
+            )
+else:
+    st.info("No transactions to export")
@@ -0,0 +1,118 @@
+import re
+import unicodedata
+from typing import FrozenSet, List, Union
+
+DEVANAGARI = re.compile(r"[ऀ-ॿ]")
+
+# Runs of letters or of digits; shared by every stage that needs tokens
+TOKEN_PATTERN = re.compile(r"[^\W\d_]+|\d+")
+
+
+class NormalizedMessage:
+    """
+    A message normalized once and shared by extraction and both categorizers
+
+    text is the NFKC-normalized, lowercased message; raw keeps the original
+    for fields whose case matters (names, descriptions).
+    """
+
+    __slots__ = ('raw', 'text', 'words', 'tokens', 'has_devanagari')
+
+    def __init__(self, raw: str):
+        self.raw = raw
+        self.text = unicodedata.normalize('NFKC', raw).lower()
+        self.words: List[str] = TOKEN_PATTERN.findall(self.text)
+        self.tokens: FrozenSet[str] = frozenset(self.words)
+        self.has_devanagari = DEVANAGARI.search(self.text) is not None
+
+    def __str__(self) -> str:
+        return self.raw
+
+
+def normalize_message(message: Union[str, NormalizedMessage]) -> NormalizedMessage:
+    """
+    Normalize a message, passing through ones that already are
+    """
+    if isinstance(message, NormalizedMessage):
+        return message
+    return NormalizedMessage(str(message))
+
+
+def _lower_literals(pattern: str) -> str:
+    """
+    Lowercase a regex's literal characters while leaving escapes like \\S or \\D
+    and named groups like (?P<name>...) intact
+    """
+    out = []
+    i = 0
+    while i < len(pattern):
+        if pattern[i] == '\\' and i + 1 < len(pattern):
+            out.append(pattern[i:i + 2])
+            i += 2
+        elif pattern.startswith('(?P', i):
+            end = pattern.find('>', i) + 1 if pattern.startswith('(?P<', i) else pattern.find(')', i)
+            out.append(pattern[i:end])
+            i = end
+        else:
+            out.append(pattern[i].lower())
+            i += 1
+    return ''.join(out)
+
+
+def _split_top_level(pattern: str) -> List[str]:
+    """
+    Split a regex on alternations that are not nested in a group or class
+    """
+    branches = []
+    depth = 0
+    in_class = False
+    start = 0
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == '\\':
+            i += 2
+            continue
+        if in_class:
+            in_class = char != ']'
+        elif char == '[':
+            in_class = True
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == '|' and depth == 0:
+            branches.append(pattern[start:i])
+            start = i + 1
+        i += 1
+    branches.append(pattern[start:])
+    return branches
+
+
+class NormalizedPattern:
+    """
+    Pattern precompiled for matching against NormalizedMessage.text
+
+    Literals are lowercased so no IGNORECASE scan is needed. Top-level
+    branches written in Devanagari are dropped from the variant used for
+    messages that contain no Devanagari at all.
+    """
+
+    def __init__(self, pattern: str):
+        self.pattern = pattern
+        self.full = re.compile(_lower_literals(unicodedata.normalize('NFKC', pattern)))
+
+        latin = [b for b in _split_top_level(pattern) if not DEVANAGARI.search(b)]
+        if latin and len(latin) < len(_split_top_level(pattern)):
+            self.latin = re.compile(_lower_literals('|'.join(latin)))
+        else:
+            self.latin = self.full
+
+    def _regex(self, message: NormalizedMessage):
+        return self.full if message.has_devanagari else self.latin
+
+    def search(self, message: NormalizedMessage):
+        return self._regex(message).search(message.text)
+
+    def finditer(self, message: NormalizedMessage):
+        return self._regex(message).finditer(message.text)
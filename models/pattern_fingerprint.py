@@ -0,0 +1,95 @@
+from typing import Dict, List, Set
+import hashlib
+import inspect
+import json
+
+from models import regex_patterns, sms_categorizer, category_patterns, sender_profiles, message_normalizer
+
+
+def _sources(*objects) -> List[str]:
+    """
+    Source code of the functions/modules that apply a group's patterns
+
+    Hard-coded rules (e.g. the description patterns in extract_description)
+    live in code rather than pattern tables, so editing them must mark rows
+    stale too.
+    """
+    return [inspect.getsource(obj) for obj in objects]
+
+
+def _extraction_rules() -> List[str]:
+    # Imported here: utils depends on models, not the other way round
+    from utils import sms_processor
+    return _sources(
+        message_normalizer,
+        sms_processor.extract_fields,
+        sms_processor.extract_transaction_details,
+        sms_processor.extract_with_sender_profile,
+        sms_processor.extract_description,
+        sms_processor.extract_available_balance,
+        sms_processor.extract_account_number,
+        sms_processor.mask_account_number,
+        sms_processor.parse_amount
+    )
+
+
+def _category_rules() -> List[str]:
+    from utils import transaction_categorizer
+    return _sources(transaction_categorizer.categorize_transaction)
+
+
+# Pattern groups and the definitions (pattern tables plus the code applying them) each one is built from
+PATTERN_GROUPS = {
+    'extraction': lambda: [regex_patterns.REGEX_MAP, _extraction_rules()],
+    'sender_profiles': lambda: {
+        sender: [(t['name'], t['pattern'].pattern, t['fields']) for t in templates]
+        for sender, templates in sender_profiles.SENDER_PROFILES.items()
+    },
+    'sms_categories': lambda: [
+        sms_categorizer.SMS_TYPE_PATTERNS,
+        sms_categorizer.ACCOUNT_TYPE_PATTERNS,
+        sms_categorizer.SMS_SUBTYPE_PATTERNS,
+        sms_categorizer.TRANSACTION_TYPE_PATTERNS,
+        sms_categorizer.TRANSACTION_CHANNEL_PATTERNS,
+        _sources(sms_categorizer.categorize_sms)
+    ],
+    'categories': lambda: [category_patterns.CATEGORY_PATTERNS, _category_rules()]
+}
+
+# Column storing the fingerprint of the patterns each row was parsed with
+FINGERPRINT_COLUMN = 'pattern_fingerprint'
+
+
+def group_fingerprints() -> Dict[str, str]:
+    """
+    Short content hash of each pattern group
+    """
+    return {
+        group: hashlib.sha1(json.dumps(definition(), sort_keys=True, ensure_ascii=False)
+                            .encode('utf-8')).hexdigest()[:10]
+        for group, definition in PATTERN_GROUPS.items()
+    }
+
+
+def current_fingerprint() -> str:
+    """
+    Fingerprint of the whole pattern set, e.g. 'categories=1a2b..;extraction=...'
+    """
+    return ';'.join(f"{group}={digest}" for group, digest in sorted(group_fingerprints().items()))
+
+
+def parse_fingerprint(fingerprint: str) -> Dict[str, str]:
+    if not isinstance(fingerprint, str) or not fingerprint:
+        return {}
+    return dict(part.split('=', 1) for part in fingerprint.split(';') if '=' in part)
+
+
+def changed_groups(fingerprint: str, current: Dict[str, str] = None) -> Set[str]:
+    """
+    Pattern groups whose definitions differ from the ones a row was parsed with
+
+    Rows without a fingerprint are treated as parsed with unknown patterns.
+    """
+    current = current or group_fingerprints()
+    recorded = parse_fingerprint(fingerprint)
+    return {group for group, digest in current.items() if recorded.get(group) != digest}
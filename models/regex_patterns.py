@@ -38,10 +38,33 @@ ENTITY_PATTERNS = {
     'balance': r"balance\s*is:|balance\s*\.|balance\s*:|balance\s*-|balance\.\s*is|balance\s*is|balance\s*:\s*is|balance\s*-\s*is|balance|bal\s*is|bal\s*:|bal\s*-|bal\s*\.|bal\s*\.\s*is|bal\s*:\s*is|bal\s*-\s*is|bal|bl\.|bl:|bl\s",
 }
 
+# Values reported alongside a transaction, built from the entity patterns
+# e.g. "Avl Bal INR 1,418.66", "Available Balance Rs.2494.86", "Avlbl Amt:Rs.772.62", "A/cX8589"
+REPORTED_VALUE_PATTERNS = {
+    'availablebalance': r"(?<![a-z])(?:(?:" + ENTITY_PATTERNS['available'] + r")\s*(?:" + ENTITY_PATTERNS['balance'] +
+                        r"|amt)|" + ENTITY_PATTERNS['balance'] + r")[\s:\-\.]*(?:is\s*)?(?:rs|inr|₹)?[\s:\.]*(-?\d[\d,]*(?:\.\d+)?)",
+    'maskedaccount': r"(?:" + ENTITY_PATTERNS['account'] + r")\s*(?:no\.?|number)?[\s:\-]*(?:\.*\s*" + REGEX_MAP_PRE['pan'] +
+                     r"|\.{2,}\s*(\d{3,}))",
+}
+
+# Loan/policy entities, scanned together in one pass (order matters: earlier branches win)
+# e.g. "EMI Rs 1900.00 for Dec-24 towards loan no. 4M50CDLH135403 received", "overdue by 12 days"
+OBLIGATION_PATTERNS = {
+    'loannumber': r"\b(?:loans?|lan|policy|agreement|agr)\s*(?:account|a/c|acct)?\s*(?:no\.?|number|num)?\s*[:\.]?\s*([\*x]*[a-z]*\d[a-z\d]{3,})",
+    'generalpan': r"(?<![a-z])(?:" + REGEX_MAP_POST['generalpan'] + r")",
+    'dpd': REGEX_MAP_POST['dpd'] + r"|(?:overdue|past\s*due)\s*(?:by\s*)?>?\s*(\d+)\s*days",
+    'duedate': r"due\b[^\.]{0,60}?\b(?:on|by|date)\s*(?:dt\.?\s*)?" + REGEX_MAP_PRE['date'],
+    'status': r"\b(bounced|overdue|past\s*due|received|paid|due)\b",
+    'generalamount': REGEX_MAP_POST['generalamount'],
+    'amount': REGEX_MAP_PRE['amount'],
+    'generalcode': REGEX_MAP_POST['generalcode'],
+}
+
 # Combined map for all patterns
 REGEX_MAP = {
     **REGEX_MAP_PRE,
     **REGEX_MAP_POST,
     **TRANSACTION_PATTERNS,
-    **ENTITY_PATTERNS
+    **ENTITY_PATTERNS,
+    **REPORTED_VALUE_PATTERNS
 }
@@ -0,0 +1,165 @@
+from typing import Dict, List
+import re
+
+# Amount with optional thousands separators and decimals
+AMOUNT = r"(?P<amount>\d[\d,]*(?:\.\d+)?)"
+BALANCE = r"(?P<balance>\d[\d,]*(?:\.\d+)?)"
+
+# Map of verbs captured by the direction group to transaction types
+DIRECTION_TYPES = {
+    'credited': 'credit',
+    'credit': 'credit',
+    'debited': 'debit',
+    'debit': 'debit'
+}
+
+# Bank-specific templates keyed by normalized sender ID. Each template
+# extracts every field it knows in a single match; 'fields' holds values
+# that are implied by the template itself.
+SENDER_PROFILES: Dict[str, List[Dict]] = {
+    'sbiupi': [
+        {
+            'name': 'sbiupi_transfer',
+            'pattern': r"ur A/c\s*X(?P<account>\d+) (?P<direction>credited|debited) by Rs\.?" + AMOUNT +
+                       r" on (?P<date>\w+) by\s*(?P<counterparty>.*?)\s*\(Ref no (?P<reference>\d+)\)",
+            'fields': {'mode': 'UPI'}
+        },
+        {
+            'name': 'sbiupi_transfer_from',
+            'pattern': r"your A/c X(?P<account>\d+)-(?P<direction>credited|debited) by Rs\.?" + AMOUNT +
+                       r" on (?P<date>\w+) transfer from (?P<counterparty>.+?) Ref No (?P<reference>\d+)",
+            'fields': {'mode': 'UPI'}
+        },
+        {
+            'name': 'sbiupi_txn',
+            'pattern': r"UPI Txn of Rs\.?" + AMOUNT + r" frm \w+ A/cX(?P<account>\d+) is successful",
+            'fields': {'type': 'debit', 'mode': 'UPI'}
+        },
+        {
+            'name': 'sbiupi_autopay',
+            'pattern': r"UPI AutoPay for (?P<counterparty>.+?) debit of Rs\.?" + AMOUNT +
+                       r" is scheduled on \.?(?P<date>[\d/]+), (?P<upi_id>[-\w.]+@\w+)",
+            'fields': {'type': 'debit', 'mode': 'Auto Debit'}
+        }
+    ],
+    'cbssbi': [
+        {
+            'name': 'cbssbi_statement',
+            'pattern': r"Your A/?C X+(?P<account>\d+) (?P<direction>Credited|Debited) INR " + AMOUNT +
+                       r" on (?P<date>[\d/]+) -(?P<counterparty>.+?)\.? Avl Bal INR " + BALANCE
+        },
+        {
+            'name': 'cbssbi_transfer',
+            'pattern': r"Your A/C X+(?P<account>\d+) has a (?P<direction>debit|credit) by transfer of Rs " + AMOUNT +
+                       r" on (?P<date>[\d/]+)\. Avl Bal Rs " + BALANCE
+        }
+    ],
+    'pnbsms': [
+        {
+            'name': 'pnbsms_upi',
+            'pattern': r"A/c X+(?P<account>\d+) (?P<direction>debited|credited) INR " + AMOUNT +
+                       r" Dt (?P<date>[\d-]+) (?P<time>\d{1,2}:\d{2}) thru UPI:(?P<reference>\d+)"
+                       r"(?:\.\s*Bal INR " + BALANCE + r")?",
+            'fields': {'mode': 'UPI'}
+        },
+        {
+            'name': 'pnbsms_upi_long',
+            'pattern': r"A/c X+(?P<account>\d+) has been (?P<direction>debited|credited) with Rs\." + AMOUNT +
+                       r" on (?P<date>[\d-]+) (?P<time>[\d:]+) thru UPI",
+            'fields': {'mode': 'UPI'}
+        }
+    ],
+    'sbiinb': [
+        {
+            'name': 'sbiinb_imps',
+            'pattern': r"Your a/c no\. X+(?P<account>\d+) is (?P<direction>credited|debited) by Rs\." + AMOUNT +
+                       r" on (?P<date>[\d-]+) by a/c linked to mobile \S+?-(?P<counterparty>.+?)"
+                       r" \(IMPS Ref no (?P<reference>\d+)\)",
+            'fields': {'mode': 'Net Banking'}
+        }
+    ],
+    'atmsbi': [
+        {
+            'name': 'atmsbi_withdrawal',
+            'pattern': r"Rs\." + AMOUNT + r" withdrawn at (?P<counterparty>.+? ATM \S+) from A/cX(?P<account>\d+)"
+                       r" on (?P<date>\w+) Transaction Number (?P<reference>\d+)\. Available Balance Rs\." + BALANCE,
+            'fields': {'type': 'debit', 'mode': 'ATM'}
+        },
+        {
+            'name': 'atmsbi_yono',
+            'pattern': r"Yono Cash Rs " + AMOUNT + r" w/d@(?P<counterparty>.+? ATM \S+) fm A/cX(?P<account>\d+)"
+                       r" on (?P<date>\w+) Ref#(?P<reference>\d+)",
+            'fields': {'type': 'debit', 'mode': 'ATM'}
+        }
+    ],
+    'paytmb': [
+        {
+            'name': 'paytmb_reversal',
+            'pattern': r"Rs\." + AMOUNT + r" has been credited back to your account - (?P<account>\d+)\."
+                       r" UPI Ref no: (?P<reference>\d+)",
+            'fields': {'type': 'credit', 'mode': 'UPI'}
+        }
+    ],
+    'idfcfb': [
+        {
+            'name': 'idfcfb_emi_due',
+            'pattern': r"EMI of INR " + AMOUNT + r" is due for (?P<counterparty>.+?) a/c no \*+(?P<account>\d+)"
+                       r" on (?P<date>[\w-]+)",
+            'fields': {'mode': 'Auto Debit'}
+        },
+        {
+            'name': 'idfcfb_overdue',
+            'pattern': r"Amount of Rs\. " + AMOUNT + r" towards LAN (?P<account>\d+) is overdue",
+            'fields': {'counterparty': 'Loan Overdue'}
+        },
+        {
+            'name': 'idfcfb_emi_bounced',
+            'pattern': r"EMI presentation of Rs " + AMOUNT + r" towards (?P<counterparty>.+?) Loan account no"
+                       r" \*+(?P<account>\d+) has bounced",
+            'fields': {'mode': 'Auto Debit'}
+        }
+    ]
+}
+
+# Banks behind sender IDs. A bank alerts from several IDs (UPI, core banking,
+# ATM, net banking), so the bank rather than the sender identifies an account.
+SENDER_BANKS: Dict[str, str] = {
+    'sbiupi': 'SBI',
+    'cbssbi': 'SBI',
+    'sbiinb': 'SBI',
+    'sbipsg': 'SBI',
+    'atmsbi': 'SBI',
+    'sbyono': 'SBI',
+    'bobsms': 'BOB',
+    'bobtxn': 'BOB',
+    'pnbsms': 'PNB',
+    'hdfcbk': 'HDFC',
+    'icicib': 'ICICI',
+    'axisbk': 'AXIS',
+    'kotakb': 'KOTAK',
+    'idfcfb': 'IDFCFB',
+    'paytmb': 'PAYTM'
+}
+
+# Precompile every template once at import
+for _templates in SENDER_PROFILES.values():
+    for _template in _templates:
+        _template['pattern'] = re.compile(_template['pattern'], re.IGNORECASE)
+        _template.setdefault('fields', {})
+
+
+def normalize_sender(sender: str) -> str:
+    """
+    Reduce a sender header such as 'VM-SBIUPI-S' to its core ID ('sbiupi')
+    """
+    sender = str(sender).strip().lower()
+    match = re.fullmatch(r"(?:[a-z]{2}-)?([a-z0-9]+)(?:-[a-z])?", sender)
+    return match.group(1) if match else sender
+
+
+def sender_bank(sender: str) -> str:
+    """
+    Bank code for a sender header, e.g. 'VM-CBSSBI-S' -> 'SBI'; unknown senders map to their own ID
+    """
+    sender = normalize_sender(sender)
+    return SENDER_BANKS.get(sender, sender.upper())
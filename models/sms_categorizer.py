@@ -1,5 +1,5 @@
-from typing import Dict
-import re
+from typing import Dict, Union
+from models.message_normalizer import NormalizedMessage, NormalizedPattern, normalize_message
 
 # SMS Type Patterns
 SMS_TYPE_PATTERNS = {
@@ -50,47 +50,32 @@ TRANSACTION_CHANNEL_PATTERNS = {
     'mobile_banking': r"mobile\s*banking|app"
 }
 
-def categorize_sms(message: str) -> Dict[str, str]:
+# Patterns compiled once for matching against normalized (lowercased) text
+_CATEGORY_GROUPS = {
+    'sms_type': SMS_TYPE_PATTERNS,
+    'account_type': ACCOUNT_TYPE_PATTERNS,
+    'sms_subtype': SMS_SUBTYPE_PATTERNS,
+    'transaction_type': TRANSACTION_TYPE_PATTERNS,
+    'transaction_channel': TRANSACTION_CHANNEL_PATTERNS
+}
+_COMPILED_GROUPS = {
+    group: [(name, NormalizedPattern(pattern)) for name, pattern in patterns.items()]
+    for group, patterns in _CATEGORY_GROUPS.items()
+}
+
+def categorize_sms(message: Union[str, NormalizedMessage]) -> Dict[str, str]:
     """
     Categorize SMS based on various patterns
     """
-    message = message.lower()
-    categories = {
-        'sms_type': 'unknown',
-        'account_type': 'unknown',
-        'sms_subtype': 'unknown',
-        'transaction_type': 'unknown',
-        'transaction_channel': 'unknown'
-    }
-    
-    # Categorize SMS Type
-    for sms_type, pattern in SMS_TYPE_PATTERNS.items():
-        if re.search(pattern, message, re.IGNORECASE):
-            categories['sms_type'] = sms_type
-            break
-    
-    # Categorize Account Type
-    for acc_type, pattern in ACCOUNT_TYPE_PATTERNS.items():
-        if re.search(pattern, message, re.IGNORECASE):
-            categories['account_type'] = acc_type
-            break
-    
-    # Categorize SMS Subtype
-    for subtype, pattern in SMS_SUBTYPE_PATTERNS.items():
-        if re.search(pattern, message, re.IGNORECASE):
-            categories['sms_subtype'] = subtype
-            break
-    
-    # Categorize Transaction Type
-    for trans_type, pattern in TRANSACTION_TYPE_PATTERNS.items():
-        if re.search(pattern, message, re.IGNORECASE):
-            categories['transaction_type'] = trans_type
-            break
-    
-    # Categorize Transaction Channel
-    for channel, pattern in TRANSACTION_CHANNEL_PATTERNS.items():
-        if re.search(pattern, message, re.IGNORECASE):
-            categories['transaction_channel'] = channel
-            break
-    
+    message = normalize_message(message)
+    categories = {}
+
+    # First matching pattern wins within each group
+    for group, patterns in _COMPILED_GROUPS.items():
+        categories[group] = 'unknown'
+        for name, pattern in patterns:
+            if pattern.search(message):
+                categories[group] = name
+                break
+
     return categories
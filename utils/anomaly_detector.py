@@ -0,0 +1,214 @@
+import pandas as pd
+import json
+import math
+import os
+import threading
+from typing import Dict, List, Optional
+
+ANOMALY_STATE_PATH = 'data/anomaly_state.json'
+
+# Columns whose values each get their own running statistics
+# ('description' is the merchant/payee extracted from the SMS)
+ANOMALY_DIMENSIONS = ['category', 'account_type', 'description']
+
+
+class RunningStats:
+    """
+    Welford running mean/variance with optional exponential decay
+    """
+
+    def __init__(self, weight: float = 0.0, mean: float = 0.0, m2: float = 0.0):
+        self.weight = weight
+        self.mean = mean
+        self.m2 = m2
+
+    def update(self, value: float, decay: float = 1.0) -> None:
+        """
+        Add one observation; decay < 1 down-weights older observations
+        """
+        self.weight = self.weight * decay + 1.0
+        self.m2 *= decay
+        delta = value - self.mean
+        self.mean += delta / self.weight
+        self.m2 += delta * (value - self.mean)
+
+    @property
+    def variance(self) -> float:
+        if self.weight <= 1.0:
+            return 0.0
+        return self.m2 / (self.weight - 1.0)
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(max(self.variance, 0.0))
+
+    def zscore(self, value: float) -> Optional[float]:
+        std = self.std
+        if std == 0:
+            return None
+        return (value - self.mean) / std
+
+    def to_dict(self) -> Dict:
+        return {'weight': self.weight, 'mean': self.mean, 'm2': self.m2}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'RunningStats':
+        return cls(data['weight'], data['mean'], data['m2'])
+
+
+class AnomalyDetector:
+    """
+    Online per-category, per-account and per-merchant anomaly detector
+
+    Each transaction is scored against the running statistics of its own
+    category, account type and merchant, then folded into them, so scoring
+    and updating cost O(1) per transaction. With half_life set, statistics
+    decay so that an observation loses half its weight after half_life
+    newer transactions in the same group.
+    """
+
+    def __init__(self, threshold: float = 2.0, min_count: int = 5,
+                 half_life: Optional[float] = None,
+                 transaction_types: tuple = ('debit',)):
+        self.threshold = threshold
+        self.min_count = min_count
+        self.half_life = half_life
+        self.transaction_types = tuple(transaction_types)
+        self.stats: Dict[str, Dict[str, RunningStats]] = {
+            dimension: {} for dimension in ANOMALY_DIMENSIONS
+        }
+        # One detector may be shared by every session in the process
+        self._lock = threading.RLock()
+
+    @property
+    def decay(self) -> float:
+        if not self.half_life:
+            return 1.0
+        return 0.5 ** (1.0 / self.half_life)
+
+    def score(self, transaction: Dict) -> Dict[str, float]:
+        """
+        Z-scores of the transaction amount against each of its groups
+        """
+        amount = float(transaction.get('amount', 0) or 0)
+        scores = {}
+        for dimension in ANOMALY_DIMENSIONS:
+            key = str(transaction.get(dimension, 'unknown'))
+            stats = self.stats[dimension].get(key)
+            if stats is None or stats.weight < self.min_count:
+                continue
+            z = stats.zscore(amount)
+            if z is not None:
+                scores[dimension] = z
+        return scores
+
+    def update(self, transaction: Dict) -> None:
+        """
+        Fold the transaction amount into the statistics of its groups
+        """
+        amount = float(transaction.get('amount', 0) or 0)
+        decay = self.decay
+        for dimension in ANOMALY_DIMENSIONS:
+            key = str(transaction.get(dimension, 'unknown'))
+            stats = self.stats[dimension].setdefault(key, RunningStats())
+            stats.update(amount, decay)
+
+    def observe(self, transaction: Dict) -> Optional[Dict]:
+        """
+        Score and then learn from a transaction; returns an alert if it is unusual
+        """
+        if transaction.get('type') not in self.transaction_types:
+            return None
+
+        scores = self.score(transaction)
+        self.update(transaction)
+
+        flagged = {dim: z for dim, z in scores.items() if z > self.threshold}
+        if not flagged:
+            return None
+
+        return {
+            'date': transaction.get('date'),
+            'amount': transaction.get('amount'),
+            'description': transaction.get('description'),
+            'category': transaction.get('category'),
+            'account_type': transaction.get('account_type'),
+            'scores': flagged
+        }
+
+    def process(self, df: pd.DataFrame) -> List[Dict]:
+        """
+        Observe a batch of new transactions in order and return the alerts
+        """
+        if df.empty:
+            return []
+
+        alerts = []
+        ordered = df.sort_values('date', kind='stable') if 'date' in df.columns else df
+        with self._lock:
+            for transaction in ordered.to_dict('records'):
+                alert = self.observe(transaction)
+                if alert:
+                    alerts.append(alert)
+        return alerts
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            return self._to_dict()
+
+    def _to_dict(self) -> Dict:
+        return {
+            'threshold': self.threshold,
+            'min_count': self.min_count,
+            'half_life': self.half_life,
+            'transaction_types': list(self.transaction_types),
+            'stats': {
+                dimension: {key: stats.to_dict() for key, stats in groups.items()}
+                for dimension, groups in self.stats.items()
+            }
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'AnomalyDetector':
+        detector = cls(
+            threshold=data.get('threshold', 2.0),
+            min_count=data.get('min_count', 5),
+            half_life=data.get('half_life'),
+            transaction_types=tuple(data.get('transaction_types', ('debit',)))
+        )
+        for dimension, groups in data.get('stats', {}).items():
+            detector.stats[dimension] = {
+                key: RunningStats.from_dict(stats) for key, stats in groups.items()
+            }
+        return detector
+
+
+def save_detector(detector: AnomalyDetector, path: str = ANOMALY_STATE_PATH) -> None:
+    """
+    Persist detector state next to the transaction store
+    """
+    try:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(detector.to_dict(), f)
+    except Exception as e:
+        print(f"Error saving anomaly state: {e}")
+
+
+def load_detector(history: Optional[pd.DataFrame] = None,
+                  path: str = ANOMALY_STATE_PATH) -> AnomalyDetector:
+    """
+    Load persisted detector state, or build it once from the stored history
+    """
+    try:
+        if os.path.exists(path):
+            with open(path) as f:
+                return AnomalyDetector.from_dict(json.load(f))
+    except Exception as e:
+        print(f"Error loading anomaly state: {e}")
+
+    detector = AnomalyDetector()
+    if history is not None and not history.empty:
+        detector.process(history)
+        save_detector(detector, path)
+    return detector
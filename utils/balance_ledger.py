@@ -0,0 +1,144 @@
+import pandas as pd
+import numpy as np
+from typing import Dict, List, Optional
+from utils.deduplication import drop_flagged_duplicates
+from utils.sms_processor import account_key
+
+# Reported and computed balances closer than this are treated as reconciled
+RECONCILE_TOLERANCE = 1.0
+
+
+class BalanceLedger:
+    """
+    Per-account time series of the balances banks report in their SMS
+
+    Accounts are keyed by bank and last four digits (see account_key), so
+    accounts at different banks that share trailing digits stay apart.
+
+    Each account's observations are sorted by date once, so an as-of lookup
+    is a single binary search and as-of joins use pd.merge_asof. Signed
+    transaction amounts are kept per account as prefix sums to reconcile
+    consecutive reported balances (credits add, debits subtract).
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        df = drop_flagged_duplicates(df)
+        columns = {'date', 'amount', 'type', 'account_number', 'available_balance'}
+        if df.empty or not columns.issubset(df.columns):
+            df = pd.DataFrame(columns=sorted(columns))
+
+        df = df.assign(
+            date=pd.to_datetime(df['date'], errors='coerce'),
+            account_number=ledger_accounts(df),
+            available_balance=pd.to_numeric(df['available_balance'], errors='coerce'),
+            amount=pd.to_numeric(df['amount'], errors='coerce').fillna(0)
+        )
+        df = df[df['date'].notna() & (df['account_number'] != '')]
+        df = df.sort_values(['account_number', 'date'], kind='stable')
+
+        kind = df['type']
+        sign = np.select([(kind == 'credit').to_numpy(dtype=bool, na_value=False),
+                          (kind == 'debit').to_numpy(dtype=bool, na_value=False)], [1.0, -1.0], 0.0)
+        flows = df.assign(flow=df['amount'].to_numpy() * sign)
+
+        self._flows: Dict[str, tuple] = {}
+        for account, rows in flows.groupby('account_number', sort=False):
+            dates = rows['date'].to_numpy(dtype='datetime64[ns]')
+            cumulative = np.concatenate(([0.0], np.cumsum(rows['flow'].to_numpy())))
+            self._flows[account] = (dates, cumulative)
+
+        observed = df[df['available_balance'].notna()]
+        self._balances = observed[['account_number', 'date', 'available_balance']] \
+            .rename(columns={'available_balance': 'balance'}).reset_index(drop=True)
+        self._series: Dict[str, tuple] = {}
+        for account, rows in self._balances.groupby('account_number', sort=False):
+            self._series[account] = (
+                rows['date'].to_numpy(dtype='datetime64[ns]'),
+                rows['balance'].to_numpy(dtype=float)
+            )
+
+    @property
+    def accounts(self) -> List[str]:
+        return sorted(self._series)
+
+    def series(self, account: Optional[str] = None) -> pd.DataFrame:
+        """
+        Reported balances sorted by date, for one account or all of them
+        """
+        if account is None:
+            return self._balances
+        return self._balances[self._balances['account_number'] == account].reset_index(drop=True)
+
+    def balance_as_of(self, account: str, date) -> Optional[float]:
+        """
+        Latest balance reported for the account at or before date
+        """
+        if account not in self._series:
+            return None
+        dates, balances = self._series[account]
+        position = np.searchsorted(dates, np.datetime64(pd.Timestamp(date), 'ns'), side='right') - 1
+        return float(balances[position]) if position >= 0 else None
+
+    def balances_as_of(self, date) -> Dict[str, float]:
+        """
+        Latest reported balance of every account at or before date
+        """
+        balances = {}
+        for account in self.accounts:
+            balance = self.balance_as_of(account, date)
+            if balance is not None:
+                balances[account] = balance
+        return balances
+
+    def join_as_of(self, df: pd.DataFrame, on: str = 'date') -> pd.DataFrame:
+        """
+        Attach to each row the balance its account last reported at or before it
+        """
+        left = df.assign(**{on: pd.to_datetime(df[on], errors='coerce'), 'ledger_account': ledger_accounts(df)}) \
+            .dropna(subset=[on]).sort_values(on, kind='stable')
+        right = self._balances.rename(columns={'account_number': 'ledger_account', 'date': on}) \
+            .sort_values(on, kind='stable')
+        right['ledger_account'] = right['ledger_account'].astype(left['ledger_account'].dtype)
+        return pd.merge_asof(left, right, on=on, by='ledger_account', direction='backward')
+
+    def reconcile(self, tolerance: float = RECONCILE_TOLERANCE) -> pd.DataFrame:
+        """
+        Compare each reported balance with the previous one plus the flows in between
+
+        Mismatches usually mean transactions whose SMS is missing or was not
+        parsed, or charges the bank never sent an alert for.
+        """
+        frames = []
+        for account, (dates, balances) in self._series.items():
+            flow_dates, cumulative = self._flows[account]
+            # Flows up to and including each observation's timestamp
+            positions = np.searchsorted(flow_dates, dates, side='right')
+            flow_between = np.diff(cumulative[positions])
+            expected = balances[:-1] + flow_between
+            frames.append(pd.DataFrame({
+                'account_number': account,
+                'date': dates[1:],
+                'previous_balance': balances[:-1],
+                'flows': flow_between,
+                'expected_balance': expected,
+                'reported_balance': balances[1:],
+                'discrepancy': balances[1:] - expected
+            }))
+
+        if not frames:
+            return pd.DataFrame(columns=['account_number', 'date', 'previous_balance', 'flows',
+                                         'expected_balance', 'reported_balance', 'discrepancy', 'reconciled'])
+
+        result = pd.concat(frames, ignore_index=True)
+        result['reconciled'] = result['discrepancy'].abs() <= tolerance
+        return result
+
+
+def ledger_accounts(df: pd.DataFrame) -> pd.Series:
+    """
+    Ledger key (bank and last four digits) of each row's account, '' when it has none
+    """
+    accounts = df['account_number'].fillna('').astype(str)
+    senders = df['sender'].fillna('').astype(str) if 'sender' in df.columns else pd.Series('', index=df.index)
+    return pd.Series([account_key(account, sender) if account else ''
+                      for account, sender in zip(accounts, senders)], index=df.index, dtype=object)
@@ -1,16 +1,36 @@
 import pandas as pd
-import json
+import numpy as np
+import gzip
+import tempfile
 from datetime import datetime
+from typing import IO, BinaryIO, Iterator, List, Optional
 import os
 
+# Arrow IPC copy of transactions.csv that readers memory-map instead of parsing
+SNAPSHOT_PATH = 'data/transactions.arrow'
+
+# Held by the process that owns the store, so offline tools never rewrite it underneath
+STORE_LOCK_PATH = 'data/transactions.lock'
+
 def load_data() -> pd.DataFrame:
     """
     Load transaction data from storage
+
+    Prefers the Arrow snapshot when it is at least as new as the CSV; loading
+    it does no parsing. String columns, and numeric or date columns without
+    missing values, are backed by the memory-mapped file, so every process on
+    the host shares those pages; boolean columns and columns with missing
+    numbers are converted into process-local arrays.
     """
+    snapshot = load_snapshot()
+    if snapshot is not None:
+        return snapshot
+
     try:
         if os.path.exists('data/transactions.csv'):
             df = pd.read_csv('data/transactions.csv')
             df['date'] = pd.to_datetime(df['date'])
+            publish_snapshot(df)
             return df
     except Exception as e:
         print(f"Error loading data: {e}")
@@ -21,6 +41,98 @@ def load_data() -> pd.DataFrame:
         'category', 'sender', 'raw_message'
     ])
 
+def lock_store(path: str = STORE_LOCK_PATH) -> Optional[IO]:
+    """
+    Take the exclusive store lock without waiting
+
+    Returns the open lock file, which holds the lock until it is closed or the
+    process exits, or None when another process holds it.
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    handle = open(path, 'a')
+    try:
+        import fcntl
+    except ImportError:
+        # No advisory locks on this platform
+        return handle
+
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return None
+    return handle
+
+def load_snapshot(path: str = SNAPSHOT_PATH, csv_path: str = 'data/transactions.csv') -> Optional[pd.DataFrame]:
+    """
+    Memory-map the Arrow snapshot, or return None when it is missing or stale
+    """
+    try:
+        import pyarrow as pa
+    except ImportError:
+        return None
+
+    try:
+        if not os.path.exists(path):
+            return None
+        if os.path.exists(csv_path) and os.path.getmtime(path) < os.path.getmtime(csv_path):
+            return None
+        # Buffers keep the mapping alive for as long as the frame references them
+        table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+        # split_blocks keeps one block per column, so pandas does not consolidate
+        # same-typed columns into freshly allocated arrays
+        return table.to_pandas(types_mapper=_arrow_string_dtype, split_blocks=True)
+    except Exception as e:
+        print(f"Error loading snapshot: {e}")
+        return None
+
+def publish_snapshot(df: pd.DataFrame, path: str = SNAPSHOT_PATH) -> None:
+    """
+    Write an uncompressed Arrow IPC file of df and atomically swap it in
+
+    Readers that already mapped the previous file keep their view; new
+    readers map the new one.
+    """
+    try:
+        import pyarrow as pa
+    except ImportError:
+        return
+
+    try:
+        table = pa.table({column: _arrow_column(df[column]) for column in df.columns})
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(path) or '.', suffix='.arrow.tmp',
+                                         delete=False) as tmp:
+            with pa.ipc.new_file(tmp, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp.name, path)
+    except Exception as e:
+        print(f"Error publishing snapshot: {e}")
+
+def _arrow_string_dtype(arrow_type):
+    """
+    Keep string columns as Arrow arrays over the mapped buffers
+
+    Numbers and timestamps convert to NumPy (without copying when they have
+    no missing values) and keep the datetime64 semantics the analytics expect.
+    """
+    import pyarrow as pa
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        return pd.ArrowDtype(arrow_type)
+    return None
+
+def _arrow_column(column: pd.Series):
+    """
+    Convert a column to Arrow, storing mixed-type object columns as strings
+    """
+    import pyarrow as pa
+    try:
+        array = pa.array(column, from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        array = pa.array(column.where(column.isna(), column.astype(str)), from_pandas=True)
+    # All-missing columns have no type yet; store them as strings
+    return array.cast(pa.string()) if pa.types.is_null(array.type) else array
+
 def save_data(df: pd.DataFrame) -> None:
     """
     Save transaction data to storage
@@ -30,18 +142,185 @@ def save_data(df: pd.DataFrame) -> None:
         df.to_csv('data/transactions.csv', index=False)
     except Exception as e:
         print(f"Error saving data: {e}")
+        return
+
+    publish_snapshot(df)
+
+def append_data(df: pd.DataFrame, new_rows: Optional[pd.DataFrame]) -> None:
+    """
+    Persist appended rows, rewriting the file only when the columns changed
+
+    new_rows=None means existing rows were rewritten, so the whole file is saved.
+    """
+    try:
+        if new_rows is not None and os.path.exists('data/transactions.csv'):
+            header = pd.read_csv('data/transactions.csv', nrows=0).columns.tolist()
+            if header == list(df.columns):
+                new_rows.reindex(columns=header).to_csv(
+                    'data/transactions.csv', mode='a', header=False, index=False
+                )
+                publish_snapshot(df)
+                return
+    except Exception as e:
+        print(f"Error appending data: {e}")
+
+    save_data(df)
+
+# Rows written per chunk when exporting
+EXPORT_CHUNK_SIZE = 50000
+
+EXPORT_EXTENSIONS = {'csv': 'csv', 'json': 'json', 'jsonl': 'jsonl', 'parquet': 'parquet'}
+COMPRESSION_EXTENSIONS = {None: '', 'gzip': '.gz', 'zstd': '.zst'}
+EXPORT_MIME_TYPES = {
+    'csv': 'text/csv',
+    'json': 'application/json',
+    'jsonl': 'application/jsonl',
+    'parquet': 'application/vnd.apache.parquet'
+}
+
+def iter_export_chunks(df: pd.DataFrame, start=None, end=None, columns: Optional[List[str]] = None,
+                       chunksize: int = EXPORT_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    """
+    Yield the rows to export in chunks, applying date-range and column filters
+    """
+    columns = [c for c in columns if c in df.columns] if columns else list(df.columns)
+
+    if start is not None or end is not None:
+        dates = pd.to_datetime(df['date'], errors='coerce')
+        mask = np.ones(len(df), dtype=bool)
+        if start is not None:
+            mask &= (dates >= pd.Timestamp(start)).to_numpy()
+        if end is not None:
+            mask &= (dates < pd.Timestamp(end)).to_numpy()
+        positions = np.flatnonzero(mask)
+    else:
+        positions = np.arange(len(df))
+
+    for i in range(0, len(positions), chunksize):
+        yield df.iloc[positions[i:i + chunksize]][columns]
+
+def open_compressed(fileobj: BinaryIO, compression: Optional[str] = None) -> BinaryIO:
+    """
+    Wrap a binary file object with a streaming compressor
+    """
+    if compression is None:
+        return fileobj
+    if compression == 'gzip':
+        return gzip.GzipFile(fileobj=fileobj, mode='wb')
+    if compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError("zstd compression requires the 'zstandard' package")
+        return zstandard.ZstdCompressor().stream_writer(fileobj, closefd=False)
+    raise ValueError(f"Unsupported compression: {compression}")
+
+def write_export(fileobj: BinaryIO, df: pd.DataFrame, format: str = 'csv',
+                 compression: Optional[str] = None, start=None, end=None,
+                 columns: Optional[List[str]] = None, chunksize: int = EXPORT_CHUNK_SIZE) -> None:
+    """
+    Stream the export into a binary file object chunk by chunk
+    """
+    if format not in EXPORT_EXTENSIONS:
+        raise ValueError(f"Unsupported export format: {format}")
+
+    chunks = iter_export_chunks(df, start, end, columns, chunksize)
+
+    if format == 'parquet':
+        # Parquet compresses internally, per column chunk
+        _write_parquet(fileobj, df, chunks, columns, compression)
+        return
+
+    out = open_compressed(fileobj, compression)
+    try:
+        if format == 'json':
+            out.write(b'[')
+        first = True
+        for chunk in chunks:
+            if format == 'csv':
+                text = chunk.to_csv(index=False, header=first)
+            elif format == 'jsonl':
+                text = chunk.to_json(orient='records', lines=True, date_format='iso')
+                if not text.endswith('\n'):
+                    text += '\n'
+            else:
+                text = chunk.to_json(orient='records', date_format='iso')[1:-1]
+                if text and not first:
+                    text = ',' + text
+            if text:
+                first = False
+            out.write(text.encode('utf-8'))
+        if format == 'json':
+            out.write(b']')
+        if format == 'csv' and first:
+            # No rows matched; still write the header
+            out.write(df[columns or list(df.columns)].head(0).to_csv(index=False).encode('utf-8'))
+    finally:
+        if out is not fileobj:
+            out.close()
 
-def export_data(df: pd.DataFrame, format: str = 'csv') -> str:
+def _write_parquet(fileobj: BinaryIO, df: pd.DataFrame, chunks: Iterator[pd.DataFrame],
+                   columns: Optional[List[str]], compression: Optional[str]) -> None:
     """
-    Export data in specified format
+    Write chunks as Parquet row groups with a schema shared by every chunk
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("Parquet export requires the 'pyarrow' package")
+
+    columns = [c for c in columns if c in df.columns] if columns else list(df.columns)
+    schema = pa.Schema.from_pandas(df[columns].head(0), preserve_index=False)
+    schema = pa.schema([
+        pa.field(field.name, pa.string()) if pa.types.is_null(field.type) else field
+        for field in schema
+    ])
+
+    with pq.ParquetWriter(fileobj, schema, compression=compression or 'snappy') as writer:
+        for chunk in chunks:
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+
+def export_data(df: pd.DataFrame, format: str = 'csv', compression: Optional[str] = None,
+                start=None, end=None, columns: Optional[List[str]] = None,
+                chunksize: int = EXPORT_CHUNK_SIZE) -> str:
+    """
+    Export data in specified format, streaming it to disk in chunks
     """
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    
-    if format == 'csv':
-        filename = f'financial_export_{timestamp}.csv'
-        df.to_csv(filename, index=False)
-    elif format == 'json':
-        filename = f'financial_export_{timestamp}.json'
-        df.to_json(filename, orient='records')
-    
+    suffix = COMPRESSION_EXTENSIONS.get(compression, '') if format != 'parquet' else ''
+    filename = f'financial_export_{timestamp}.{EXPORT_EXTENSIONS.get(format, format)}{suffix}'
+
+    with open(filename, 'wb') as f:
+        write_export(f, df, format, compression, start, end, columns, chunksize)
+
     return filename
+
+def export_to_temp_file(df: pd.DataFrame, format: str = 'csv', compression: Optional[str] = None,
+                        start=None, end=None, columns: Optional[List[str]] = None,
+                        chunksize: int = EXPORT_CHUNK_SIZE) -> str:
+    """
+    Stream the export into a named temporary file and return its path
+
+    The caller owns the file and should remove it with discard_export()
+    once it has been served.
+    """
+    suffix = COMPRESSION_EXTENSIONS.get(compression, '') if format != 'parquet' else ''
+    f = tempfile.NamedTemporaryFile(suffix=f'.{EXPORT_EXTENSIONS.get(format, format)}{suffix}', delete=False)
+    try:
+        with f:
+            write_export(f, df, format, compression, start, end, columns, chunksize)
+    except Exception:
+        os.unlink(f.name)
+        raise
+    return f.name
+
+def discard_export(path: Optional[str]) -> None:
+    """
+    Remove a temporary export file, ignoring ones that are already gone
+    """
+    if path:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
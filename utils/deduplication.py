@@ -0,0 +1,182 @@
+import pandas as pd
+import numpy as np
+import re
+import hashlib
+from typing import Dict, List, Optional, Set
+
+# Alerts for the same payment from different sources usually arrive within minutes
+DUPLICATE_WINDOW_SECONDS = 600
+
+REFERENCE_NUMBER_PATTERN = re.compile(
+    r"(?:ref(?:erence)?|utr|rrn|txn\s*id|transaction\s*id)[\s\.:#-]*(?:no\.?|number)?[\s\.:#-]*(\d{6,})",
+    re.IGNORECASE
+)
+ACCOUNT_DIGITS_PATTERN = re.compile(r"(?:a/c|acct|account|card)[\s\.:-]*(?:no\.?)?[\s\.:-]*[x\*]+\s*(\d{3,})",
+                                    re.IGNORECASE)
+
+
+def match_keys(row: Dict) -> Set[str]:
+    """
+    Identifiers that link alerts for the same payment across SMS sources
+    """
+    keys = set()
+    message = str(row.get('raw_message', '') or '')
+
+    for ref in REFERENCE_NUMBER_PATTERN.findall(message):
+        keys.add(f"ref:{ref}")
+    reference = str(row.get('reference_number', '') or '')
+    for ref in re.findall(r"\d{6,}", reference):
+        keys.add(f"ref:{ref}")
+
+    upi_id = row.get('upi_id', '')
+    if isinstance(upi_id, str) and upi_id:
+        keys.add(f"upi:{upi_id.lower()}")
+
+    for digits in ACCOUNT_DIGITS_PATTERN.findall(message):
+        # Banks mask different prefixes, so compare the trailing digits only
+        keys.add(f"acct:{digits[-4:]}")
+
+    return keys
+
+
+def flag_duplicates(df: pd.DataFrame, window_seconds: int = DUPLICATE_WINDOW_SECONDS,
+                    history: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """
+    Flag alerts that describe the same payment
+
+    Each row is expanded into one entry per identifier (reference number,
+    UPI ID, account number) and the entries are sorted by (identifier, type,
+    amount, date). A single sweep then links neighbours with the same
+    identifier, type and amount that arrived within the time window, so the
+    cost is one sort rather than pairwise comparison. Account and UPI matches
+    only link rows when at most one side carries a reference number; two
+    alerts with different references are never merged. Linked rows get the
+    same duplicate_group (a hash of the earliest row, stable across uploads)
+    and every row but the earliest is marked is_duplicate; nothing is removed.
+
+    history holds already-stored rows (typically the stored rows around the
+    new ones' dates). They are matched against but never re-flagged: a stored
+    row always stays the primary of its group and keeps its group ID.
+    """
+    df = df.copy()
+    df['duplicate_group'] = pd.Series(pd.NA, index=df.index, dtype='object')
+    df['is_duplicate'] = False
+    if df.empty:
+        return df
+
+    n_stored = len(history) if history is not None else 0
+    frame = pd.concat([history, df], ignore_index=True) if n_stored else df.reset_index(drop=True)
+    if len(frame) < 2:
+        return df
+
+    dates = pd.to_datetime(frame['date'], errors='coerce').to_numpy(dtype='datetime64[ns]')
+    amounts = pd.to_numeric(frame['amount'], errors='coerce').to_numpy(dtype=float)
+    types = frame['type'].fillna('').astype(str).to_numpy() if 'type' in frame.columns \
+        else np.full(len(frame), '', dtype=object)
+    valid = ~np.isnat(dates) & ~np.isnan(amounts)
+
+    entry_positions = []
+    entry_keys = []
+    key_columns = [c for c in ('raw_message', 'reference_number', 'upi_id') if c in frame.columns]
+    for position, record in zip(np.flatnonzero(valid), frame.iloc[valid][key_columns].to_dict('records')):
+        for key in match_keys(record):
+            entry_positions.append(position)
+            entry_keys.append(key)
+    if not entry_positions:
+        return df
+
+    entries = pd.DataFrame({'pos': entry_positions, 'key': entry_keys})
+    entries['type'] = types[entries['pos']]
+    entries['amount'] = amounts[entries['pos']]
+    entries['date'] = dates[entries['pos']]
+    entries = entries.sort_values(['key', 'type', 'amount', 'date'], kind='stable')
+
+    # A debit and its reversal credit share identifiers and amount but are different payments
+    same_bucket = (entries['key'] == entries['key'].shift()) & \
+        (entries['type'] == entries['type'].shift()) & \
+        (entries['amount'] == entries['amount'].shift())
+    within_window = (entries['date'] - entries['date'].shift()) <= pd.Timedelta(seconds=window_seconds)
+    linked = (same_bucket & within_window).to_numpy()
+
+    pos = entries['pos'].to_numpy()
+    keys = entries['key'].to_numpy()
+    parent = {}
+    # Reference numbers seen in each group; alerts with different references are different payments
+    refs: Dict[int, Set[str]] = {}
+    for position, key in zip(pos, keys):
+        if key.startswith('ref:'):
+            refs.setdefault(position, set()).add(key)
+
+    def find(i: int) -> int:
+        parent.setdefault(i, i)
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def earliest(i: int) -> tuple:
+        # Stored rows rank first so they stay primary
+        return (i >= n_stored, dates[i], i)
+
+    # Reference links go first, so account/UPI links are checked against complete groups
+    candidates = np.flatnonzero(linked)
+    by_reference = np.char.startswith(keys[candidates].astype(str), 'ref:')
+    for k in np.concatenate([candidates[by_reference], candidates[~by_reference]]):
+        root_a, root_b = find(pos[k - 1]), find(pos[k])
+        if root_a == root_b:
+            continue
+        refs_a, refs_b = refs.get(root_a, set()), refs.get(root_b, set())
+        if refs_a and refs_b and refs_a.isdisjoint(refs_b):
+            continue
+        first, second = sorted((root_a, root_b), key=earliest)
+        parent[second] = first
+        refs[first] = refs_a | refs_b
+
+    groups: Dict[int, List[int]] = {}
+    for i in parent:
+        groups.setdefault(find(i), []).append(i)
+
+    existing = frame['duplicate_group'].to_numpy() if 'duplicate_group' in frame.columns \
+        else np.full(len(frame), pd.NA, dtype=object)
+    group_labels = np.full(len(frame), pd.NA, dtype=object)
+    flags = np.zeros(len(frame), dtype=bool)
+    for root, members in groups.items():
+        if len(members) < 2 or max(members) < n_stored:
+            continue
+        # Keep the ID a stored member already carries, so groups grow across uploads
+        known = [existing[i] for i in sorted(members) if i < n_stored and not pd.isna(existing[i])]
+        group_labels[members] = known[0] if known else _group_id(frame.iloc[root])
+        flags[members] = True
+        flags[root] = False
+
+    df['duplicate_group'] = group_labels[n_stored:]
+    df['is_duplicate'] = flags[n_stored:]
+
+    return df
+
+
+def _group_id(row: pd.Series) -> str:
+    """
+    Store-stable ID for a duplicate group, derived from its primary row
+    """
+    identity = f"{row.get('date', '')}|{row.get('amount', '')}|{row.get('raw_message', '')}"
+    return hashlib.sha1(identity.encode('utf-8')).hexdigest()[:16]
+
+
+def stored_neighbours(snapshot, df: pd.DataFrame,
+                      window_seconds: int = DUPLICATE_WINDOW_SECONDS) -> pd.DataFrame:
+    """
+    Stored rows close enough in time to new rows to be alerts for the same payments
+    """
+    if 'date' not in df.columns:
+        return snapshot.data.iloc[0:0]
+    return snapshot.rows_near(df['date'], pd.Timedelta(seconds=window_seconds))
+
+
+def drop_flagged_duplicates(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Exclude rows flagged as duplicates so sums count each payment once
+    """
+    if 'is_duplicate' not in df.columns:
+        return df
+    return df[~df['is_duplicate'].fillna(False).astype(bool)]
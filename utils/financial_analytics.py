@@ -1,17 +1,32 @@
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
+from utils.range_query import RangeQueryEngine
+from utils.deduplication import drop_flagged_duplicates
+from utils.spending_sketches import SpendingSketches
 
-def analyze_spending_patterns(df: pd.DataFrame) -> Dict:
+# Histories larger than this are analyzed from sketches rather than raw amounts
+APPROXIMATE_ANALYTICS_ROWS = 250000
+
+def analyze_spending_patterns(df: pd.DataFrame, sketches: Optional[SpendingSketches] = None) -> Dict:
     """
     Analyze spending patterns and trends
+
+    When sketches are given, statistics come from the month-partitioned
+    sketches instead of the full amount column (see analyze_sketched_patterns).
     """
     if df.empty:
         return {}
 
-    # Ensure date is datetime
-    df['date'] = pd.to_datetime(df['date'])
+    if sketches is not None:
+        return analyze_sketched_patterns(sketches, df)
+
+    # Ensure date is datetime without modifying the shared frame
+    df = df.assign(date=pd.to_datetime(df['date']))
+
+    # Count each payment once when several alerts describe it
+    df = drop_flagged_duplicates(df)
 
     # Filter debit transactions
     debits = df[df['type'] == 'debit']
@@ -53,6 +68,89 @@ def analyze_spending_patterns(df: pd.DataFrame) -> Dict:
         'spending_volatility': std_transaction
     }
 
+def analyze_sketched_patterns(sketches: SpendingSketches, df: Optional[pd.DataFrame] = None) -> Dict:
+    """
+    Approximate spending analysis from month-partitioned sketches
+
+    Sums, counts, means and standard deviations are exact. Amount quantiles
+    are within 1% relative error, distinct merchant/UPI counts within ~1.6%
+    standard error, and top merchant totals undercount by at most
+    'top_merchants_error'. Unusual transactions are looked up in df (when
+    given) using the sketched threshold.
+    """
+    if not sketches.months:
+        return {}
+
+    merged = sketches.query()
+
+    monthly_spending = {
+        month: round(sketches.partitions[month].debits.total, 2)
+        for month in sketches.months[-6:]
+    }
+
+    category_insights = {
+        category: {
+            'sum': round(sketch.total, 2),
+            'count': sketch.count,
+            'mean': round(sketch.mean, 2)
+        }
+        for category, sketch in sorted(merged.debits_by_category.items())
+    }
+
+    account_metrics = {
+        account: {
+            'mean': sketch.mean,
+            'count': sketch.count,
+            'std': sketch.std,
+            'debit_ratio': merged.debit_count_by_account.get(account, 0) / sketch.count * 100
+        }
+        for account, sketch in merged.amounts_by_account.items()
+    }
+    monthly_by_account = {
+        month: {
+            account: sketches.partitions[month].amounts_by_account[account].total
+            if account in sketches.partitions[month].amounts_by_account else 0.0
+            for account in sorted(merged.amounts_by_account)
+        }
+        for month in sketches.months
+    }
+
+    dow_spending = {
+        day: round(sketch.mean, 2) for day, sketch in sorted(merged.debits_by_weekday.items())
+    }
+
+    mean_transaction = merged.debits.mean if merged.debits.count else float('nan')
+    std_transaction = merged.debits.std
+    threshold = mean_transaction + 2 * std_transaction
+    unusual_transactions = []
+    if df is not None and not df.empty and not np.isnan(threshold):
+        df = drop_flagged_duplicates(df)
+        debits = df[(df['type'] == 'debit') & (df['amount'] > threshold)]
+        unusual_transactions = debits.assign(date=pd.to_datetime(debits['date']))[
+            ['date', 'amount', 'description', 'category']
+        ].to_dict('records')
+
+    return {
+        'monthly_trend': monthly_spending,
+        'category_insights': category_insights,
+        'account_insights': {
+            'account_metrics': account_metrics,
+            'monthly_trends': monthly_by_account
+        },
+        'day_of_week_pattern': dow_spending,
+        'unusual_transactions': unusual_transactions,
+        'average_transaction': mean_transaction,
+        'spending_volatility': std_transaction,
+        'amount_quantiles': {
+            f"p{int(q * 100)}": merged.debits.quantile(q) for q in (0.5, 0.9, 0.99)
+        },
+        'distinct_merchants': merged.merchants.estimate(),
+        'distinct_upi_ids': merged.upi_ids.estimate(),
+        'top_merchants': merged.top_merchants.top(10),
+        'top_merchants_error': merged.top_merchants.error,
+        'approximate': True
+    }
+
 def analyze_account_patterns(df: pd.DataFrame) -> Dict:
     """
     Analyze patterns across different accounts
@@ -91,6 +189,7 @@ def get_budget_recommendations(df: pd.DataFrame) -> Dict:
         return {}
 
     # Filter debit transactions
+    df = drop_flagged_duplicates(df)
     debits = df[df['type'] == 'debit']
 
     # Calculate average monthly spending by category and account
@@ -116,26 +215,33 @@ def get_budget_recommendations(df: pd.DataFrame) -> Dict:
 
     return recommendations
 
-def generate_financial_insights(df: pd.DataFrame) -> List[Dict]:
+def generate_financial_insights(df: pd.DataFrame, engine: RangeQueryEngine = None) -> List[Dict]:
     """
     Generate key financial insights and recommendations
     """
     if df.empty:
         return []
 
+    df = drop_flagged_duplicates(df)
+    if engine is None:
+        engine = RangeQueryEngine(df)
+
     insights = []
 
     # Calculate month-over-month spending change by account
-    monthly_by_account = df[df['type'] == 'debit'].groupby([
-        'account_type',
-        pd.Grouper(key='date', freq='M')
-    ])['amount'].sum().unstack()
-
-    for account in monthly_by_account.index:
-        spending = monthly_by_account.loc[account]
-        if len(spending.dropna()) >= 2:
-            current_month = spending.iloc[-1]
-            previous_month = spending.iloc[-2]
+    if engine.max_date is not None:
+        current_start = engine.max_date.to_period('M').start_time
+        previous_start = current_start - pd.DateOffset(months=1)
+        next_start = current_start + pd.DateOffset(months=1)
+
+        for account in df['account_type'].dropna().unique():
+            current = engine.query(current_start, next_start, type='debit', account_type=account)
+            previous = engine.query(previous_start, current_start, type='debit', account_type=account)
+            if not current['count'] or not previous['count'] or not previous['total']:
+                continue
+
+            current_month = current['total']
+            previous_month = previous['total']
             change_percentage = ((current_month - previous_month) / previous_month * 100)
 
             insights.append({
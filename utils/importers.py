@@ -0,0 +1,109 @@
+import pandas as pd
+import os
+import xml.etree.ElementTree as ET
+from abc import ABC, abstractmethod
+from typing import Dict, Iterator, List
+
+# Records per batch handed to the parsing pipeline
+IMPORT_BATCH_SIZE = 5000
+
+
+class SmsImporter(ABC):
+    """
+    Base class for SMS sources; subclasses yield records with body, date and address
+    """
+
+    extensions: tuple = ()
+
+    @abstractmethod
+    def iter_records(self, source) -> Iterator[Dict]:
+        ...
+
+    def iter_batches(self, source, batch_size: int = IMPORT_BATCH_SIZE) -> Iterator[pd.DataFrame]:
+        """
+        Group records into DataFrames that process_sms_data accepts
+        """
+        batch: List[Dict] = []
+        for record in self.iter_records(source):
+            batch.append(record)
+            if len(batch) >= batch_size:
+                yield pd.DataFrame(batch)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch)
+
+
+class AndroidXmlImporter(SmsImporter):
+    """
+    Incremental reader for Android "SMS Backup & Restore" XML files
+
+    Elements are cleared as soon as they are read, so memory stays flat
+    regardless of backup size.
+    """
+
+    extensions = ('xml',)
+
+    def __init__(self, include_sent: bool = False):
+        self.include_sent = include_sent
+
+    def iter_records(self, source) -> Iterator[Dict]:
+        root = None
+        for event, elem in ET.iterparse(source, events=('start', 'end')):
+            if event == 'start':
+                if root is None:
+                    root = elem
+                continue
+            if elem.tag != 'sms':
+                continue
+
+            # type 1 is inbox; 2 is sent
+            if self.include_sent or elem.get('type', '1') == '1':
+                yield {
+                    'body': elem.get('body', ''),
+                    'date': elem.get('date'),
+                    'address': elem.get('address', 'Unknown')
+                }
+
+            elem.clear()
+            if root is not None:
+                root.clear()
+
+
+class CsvImporter(SmsImporter):
+    """
+    Chunked CSV reader for exports that already have a text column
+    """
+
+    extensions = ('csv',)
+
+    def iter_records(self, source) -> Iterator[Dict]:
+        for batch in self.iter_batches(source):
+            yield from batch.to_dict('records')
+
+    def iter_batches(self, source, batch_size: int = IMPORT_BATCH_SIZE) -> Iterator[pd.DataFrame]:
+        yield from pd.read_csv(source, chunksize=batch_size)
+
+
+IMPORTERS: Dict[str, SmsImporter] = {}
+
+
+def register_importer(importer: SmsImporter) -> None:
+    """
+    Register an importer for each of its file extensions
+    """
+    for extension in importer.extensions:
+        IMPORTERS[extension.lower()] = importer
+
+
+def get_importer(filename: str) -> SmsImporter:
+    """
+    Pick the importer for a file based on its extension
+    """
+    extension = os.path.splitext(filename)[1].lstrip('.').lower()
+    if extension not in IMPORTERS:
+        raise ValueError(f"Unsupported SMS file type: .{extension}. Supported: {', '.join(sorted(IMPORTERS))}")
+    return IMPORTERS[extension]
+
+
+register_importer(AndroidXmlImporter())
+register_importer(CsvImporter())
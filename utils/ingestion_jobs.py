@@ -0,0 +1,219 @@
+import pandas as pd
+import io
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from utils.importers import get_importer, IMPORT_BATCH_SIZE
+from utils.sms_processor import process_sms_data, sender_coverage
+from utils.transaction_categorizer import categorize_transactions
+from utils.deduplication import flag_duplicates, drop_flagged_duplicates, stored_neighbours
+from utils.anomaly_detector import AnomalyDetector, save_detector
+from utils.sms_prefilter import SmsPrefilter
+from models.pattern_fingerprint import FINGERPRINT_COLUMN, current_fingerprint
+
+# Number of uploads processed at the same time
+INGESTION_WORKERS = 2
+
+# Finished jobs nobody collected are dropped after this long
+FINISHED_JOB_RETENTION_SECONDS = 600
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class IngestionJob:
+    """
+    One uploaded file being parsed in the background
+    """
+
+    def __init__(self, filename: str, data: bytes, prefilter: Optional[SmsPrefilter] = None):
+        self.id = uuid.uuid4().hex[:12]
+        self.filename = filename
+        self.prefilter = prefilter
+        self.status = 'queued'
+        self.error = ''
+        self.rows_read = 0
+        self.rows_parsed = 0
+        self.bytes_total = len(data)
+        self.bytes_read = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.columns: List[str] = []
+        self.preview: Optional[pd.DataFrame] = None
+        self.coverage: Optional[pd.DataFrame] = None
+        self.duplicates = 0
+        self.anomalies: List[Dict] = []
+        self.obligation_events: List[Dict] = []
+        # Follow-up steps that failed after the rows were merged
+        self.warnings: List[str] = []
+        self._data = data
+        self._cancel = threading.Event()
+
+    def cancel(self) -> None:
+        self._cancel.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    @property
+    def done(self) -> bool:
+        return self.status in ('completed', 'failed', 'cancelled')
+
+    def progress(self) -> Dict:
+        """
+        Rows parsed so far, throughput and an ETA based on bytes consumed
+        """
+        elapsed = 0.0
+        if self.started_at is not None:
+            elapsed = (self.finished_at or time.time()) - self.started_at
+
+        fraction = self.bytes_read / self.bytes_total if self.bytes_total else 0.0
+        if self.status == 'completed':
+            fraction = 1.0
+
+        rows_per_sec = self.rows_read / elapsed if elapsed > 0 else 0.0
+        eta = None
+        if 0 < fraction < 1 and elapsed > 0:
+            eta = elapsed * (1 - fraction) / fraction
+
+        return {
+            'status': self.status,
+            'fraction': min(fraction, 1.0),
+            'rows_read': self.rows_read,
+            'rows_parsed': self.rows_parsed,
+            'rows_per_sec': rows_per_sec,
+            'eta_seconds': eta
+        }
+
+
+class IngestionManager:
+    """
+    Worker pool that parses uploads off the UI thread
+
+    Results are merged into the store in a single append once a job has
+    finished, so a cancelled or failed job never leaves partial data behind.
+    Finished jobs are kept until collected with pop(), or for
+    FINISHED_JOB_RETENTION_SECONDS if nobody collects them.
+    """
+
+    def __init__(self, store, detector: Optional[AnomalyDetector] = None,
+                 max_workers: int = INGESTION_WORKERS, batch_size: int = IMPORT_BATCH_SIZE,
+                 obligations=None):
+        self.store = store
+        self.detector = detector
+        self.obligations = obligations
+        self.batch_size = batch_size
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ingest')
+        self._jobs: Dict[str, IngestionJob] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, filename: str, data: bytes, prefilter: Optional[SmsPrefilter] = None) -> str:
+        """
+        Queue an upload and return its job ID
+        """
+        get_importer(filename)  # fail fast on unsupported file types
+        job = IngestionJob(filename, data, prefilter)
+        with self._lock:
+            self._evict_expired()
+            self._jobs[job.id] = job
+        self._pool.submit(self._run, job)
+        return job.id
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def pop(self, job_id: str) -> Optional[IngestionJob]:
+        """
+        Remove a finished job once its outcome has been reported; running jobs stay
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job.done:
+                del self._jobs[job_id]
+            return job
+
+    def _evict_expired(self) -> None:
+        cutoff = time.time() - FINISHED_JOB_RETENTION_SECONDS
+        for job_id, job in list(self._jobs.items()):
+            if job.done and job.finished_at is not None and job.finished_at < cutoff:
+                del self._jobs[job_id]
+
+    def cancel(self, job_id: str) -> None:
+        job = self.get(job_id)
+        if job is not None:
+            job.cancel()
+
+    def _run(self, job: IngestionJob) -> None:
+        job.started_at = time.time()
+        job.status = 'running'
+        try:
+            categorized = self._parse(job)
+            if job.cancelled:
+                raise JobCancelled()
+
+            # Atomic merge: one serialized append publishes the whole upload
+            self.store.append(categorized)
+            job.duplicates = int(categorized['is_duplicate'].sum()) if 'is_duplicate' in categorized else 0
+
+            # The rows are in; later failures are reported as warnings rather than failing the job
+            if self.obligations is not None:
+                try:
+                    self.obligations.append(job.obligation_events)
+                except Exception as e:
+                    job.warnings.append(f"Loan/policy notices were not indexed: {e}")
+
+            if self.detector is not None:
+                try:
+                    job.anomalies = self.detector.process(drop_flagged_duplicates(categorized))
+                    save_detector(self.detector)
+                except Exception as e:
+                    job.warnings.append(f"Anomaly detection failed: {e}")
+
+            job.status = 'completed'
+        except JobCancelled:
+            job.status = 'cancelled'
+        except Exception as e:
+            job.status = 'failed'
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+            job._data = b''
+
+    def _parse(self, job: IngestionJob) -> pd.DataFrame:
+        importer = get_importer(job.filename)
+        source = io.BytesIO(job._data)
+
+        processed_batches = []
+        for batch in importer.iter_batches(source, batch_size=self.batch_size):
+            if job.cancelled:
+                raise JobCancelled()
+            if job.preview is None:
+                job.columns = batch.columns.tolist()
+                job.preview = batch.head()
+
+            processed = process_sms_data(
+                batch, prefilter=job.prefilter,
+                obligation_events=job.obligation_events if self.obligations is not None else None
+            )
+            processed_batches.append(processed)
+
+            job.rows_read += len(batch)
+            job.rows_parsed += len(processed)
+            job.bytes_read = source.tell()
+
+        processed_data = pd.concat(processed_batches, ignore_index=True) \
+            if processed_batches else process_sms_data(pd.DataFrame(columns=['body']))
+        # Alerts for the same payment may have arrived in an earlier upload
+        processed_data = flag_duplicates(
+            processed_data, history=stored_neighbours(self.store.snapshot(), processed_data)
+        )
+        job.coverage = sender_coverage(processed_data)
+        categorized = categorize_transactions(processed_data)
+        categorized[FINGERPRINT_COLUMN] = current_fingerprint()
+        return categorized
@@ -2,16 +2,25 @@ import pandas as pd
 from datetime import datetime, timedelta
 from typing import List, Dict
 
-def check_upcoming_bills(df: pd.DataFrame) -> List[Dict]:
+def check_upcoming_bills(df: pd.DataFrame, obligations=None) -> List[Dict]:
     """
     Check for upcoming bills and obligations
+
+    Loans and policies tracked in an ObligationIndex are looked up by their
+    number; only the remaining transactions are grouped by description.
     """
+    today = datetime.now()
+    upcoming = []
+
+    if obligations is not None:
+        upcoming.extend(obligations.upcoming(today))
+        if 'raw_message' in df.columns:
+            df = df[~obligations.covers(df['raw_message'])]
+
     # Filter recurring transactions
     recurring = identify_recurring_transactions(df)
     
     # Predict next due dates
-    upcoming = []
-    today = datetime.now()
     
     for _, row in recurring.iterrows():
         next_date = predict_next_due_date(row['date'], row['frequency'])
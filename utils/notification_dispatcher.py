@@ -0,0 +1,304 @@
+import pandas as pd
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Iterable, List, Optional
+
+from utils.notification import check_upcoming_bills
+
+SENT_LOG_PATH = 'data/sent_notifications.jsonl'
+STUB_OUTBOX_PATH = 'data/notification_outbox.jsonl'
+EVENT_FIELDS = ('key', 'recipient', 'message')
+
+
+def collect_bill_events(user_id: str, recipient: str, df: pd.DataFrame, obligations=None) -> List[Dict]:
+    """
+    Build notification events for a user's upcoming bills and loan/policy dues
+    """
+    if df.empty and obligations is None:
+        return []
+
+    return [
+        {
+            'key': f"{user_id}:bill:{bill['description']}:{bill['due_date']}",
+            'user_id': user_id,
+            'recipient': recipient,
+            'kind': 'bill',
+            'message': f"{bill['description']} due on {bill['due_date']} (Amount: ₹{bill['amount']:.2f})"
+        }
+        for bill in check_upcoming_bills(df, obligations)
+    ]
+
+
+def collect_anomaly_events(user_id: str, recipient: str, anomalies: List[Dict]) -> List[Dict]:
+    """
+    Build notification events for unusual transactions
+    """
+    return [
+        {
+            'key': f"{user_id}:anomaly:{tx['date']}:{tx['amount']}:{tx['description']}",
+            'user_id': user_id,
+            'recipient': recipient,
+            'kind': 'anomaly',
+            'message': f"Unusual amount ₹{tx['amount']:.2f} on {tx['date']} for {tx['description']}"
+        }
+        for tx in anomalies
+    ]
+
+
+class SentLog:
+    """
+    Persistent set of event keys that have already been delivered
+
+    Keys are appended to a JSON Lines file as they are delivered, so recording
+    a send costs one short write regardless of how many keys are logged.
+    """
+
+    def __init__(self, path: Optional[str] = SENT_LOG_PATH):
+        self.path = path
+        self._keys = set()
+        self._lock = threading.Lock()
+        try:
+            if path and os.path.exists(path):
+                with open(path) as f:
+                    self._keys = {json.loads(line) for line in f if line.strip()}
+        except Exception as e:
+            print(f"Error loading sent notifications: {e}")
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._keys
+
+    def add_all(self, keys: Iterable[str]) -> None:
+        with self._lock:
+            new_keys = [key for key in dict.fromkeys(keys) if key not in self._keys]
+            self._keys.update(new_keys)
+            if not self.path or not new_keys:
+                return
+            try:
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                with open(self.path, 'a') as f:
+                    f.write(''.join(json.dumps(key, ensure_ascii=False) + '\n' for key in new_keys))
+            except Exception as e:
+                print(f"Error saving sent notifications: {e}")
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket limiting sends per second across all workers
+    """
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = rate
+        self.capacity = burst or max(int(rate), 1)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+
+
+class StubTransport:
+    """
+    Local sink that records messages instead of sending them
+    """
+
+    def __init__(self, path: Optional[str] = STUB_OUTBOX_PATH):
+        self.path = path
+        self.sent: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def send(self, recipient: str, body: str) -> None:
+        record = {'recipient': recipient, 'body': body, 'sent_at': pd.Timestamp.now().isoformat()}
+        with self._lock:
+            self.sent.append(record)
+            if self.path:
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                with open(self.path, 'a') as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+class TwilioTransport:
+    """
+    Twilio SMS transport keeping one client per worker thread
+    """
+
+    def __init__(self, account_sid: str, auth_token: str, from_number: str):
+        self.account_sid = account_sid
+        self.auth_token = auth_token
+        self.from_number = from_number
+        self._local = threading.local()
+
+    @classmethod
+    def from_env(cls) -> Optional['TwilioTransport']:
+        """
+        Build a transport from TWILIO_* environment variables, if all are set
+        """
+        sid = os.environ.get('TWILIO_ACCOUNT_SID')
+        token = os.environ.get('TWILIO_AUTH_TOKEN')
+        number = os.environ.get('TWILIO_FROM_NUMBER')
+        if sid and token and number:
+            return cls(sid, token, number)
+        return None
+
+    def _client(self):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            from twilio.rest import Client
+            client = Client(self.account_sid, self.auth_token)
+            self._local.client = client
+        return client
+
+    def send(self, recipient: str, body: str) -> None:
+        self._client().messages.create(to=recipient, from_=self.from_number, body=body)
+
+
+class NotificationDispatcher:
+    """
+    Deduplicate, batch and send notification events through a worker pool
+
+    Events for the same recipient within a dispatch are combined into a single
+    message. Sends run on one long-lived worker pool (so per-thread transport
+    clients are reused across dispatches) with at most max_in_flight sends
+    queued at a time; they are shared-rate-limited and failed sends are
+    retried with exponential backoff. Call dispatch() to send synchronously,
+    or start() and submit() to send from a background thread.
+    """
+
+    def __init__(self, transport, rate_per_second: float = 10.0, max_in_flight: int = 100,
+                 max_workers: int = 4, max_retries: int = 3, backoff: float = 0.5,
+                 sent_log: Optional[SentLog] = None):
+        self.transport = transport
+        self.max_in_flight = max(max_in_flight, max_workers)
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.sent_log = sent_log if sent_log is not None else SentLog()
+        self.limiter = RateLimiter(rate_per_second)
+        self.stats = {'sent': 0, 'skipped': 0, 'failed': 0}
+        self._stats_lock = threading.Lock()
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='notify')
+
+    def _count(self, outcome: str, n: int) -> None:
+        with self._stats_lock:
+            self.stats[outcome] += n
+
+    def _send_with_retry(self, recipient: str, events: List[Dict]) -> bool:
+        body = '\n'.join(event['message'] for event in events)
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire()
+            try:
+                self.transport.send(recipient, body)
+                self.sent_log.add_all(event['key'] for event in events)
+                self._count('sent', len(events))
+                return True
+            except Exception as e:
+                if attempt == self.max_retries:
+                    print(f"Error sending notification to {recipient}: {e}")
+                    self._count('failed', len(events))
+                    return False
+                time.sleep(self.backoff * (2 ** attempt))
+        return False
+
+    def dispatch(self, events: List[Dict]) -> Dict[str, int]:
+        """
+        Send events that have not been delivered before and return the outcome counts
+        """
+        before = dict(self.stats)
+
+        pending = {}
+        for event in events:
+            if not isinstance(event, dict) or not all(field in event for field in EVENT_FIELDS):
+                print(f"Error dispatching notification: malformed event {event!r}")
+                self._count('failed', 1)
+                continue
+            if event['key'] in self.sent_log or event['key'] in pending:
+                self._count('skipped', 1)
+                continue
+            pending[event['key']] = event
+
+        by_recipient: Dict[str, List[Dict]] = {}
+        for event in pending.values():
+            by_recipient.setdefault(event['recipient'], []).append(event)
+
+        # Keep the pool busy without queueing every send up front
+        in_flight = set()
+        for recipient, recipient_events in by_recipient.items():
+            if len(in_flight) >= self.max_in_flight:
+                _, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            in_flight.add(self._pool.submit(self._send_with_retry, recipient, recipient_events))
+        wait(in_flight)
+
+        return {outcome: self.stats[outcome] - before[outcome] for outcome in self.stats}
+
+    def submit(self, events: List[Dict]) -> None:
+        """
+        Queue events for the background sender
+        """
+        # Copied here so a bad argument fails in the caller, not in the sender thread
+        self._queue.put(list(events))
+
+    def start(self) -> None:
+        """
+        Start the background sender thread
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Flush queued events and stop the background sender
+        """
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+
+    def close(self) -> None:
+        """
+        Stop the background sender and shut down the worker pool
+        """
+        self.stop()
+        self._pool.shutdown(wait=True)
+
+    def _dispatch_logged(self, events: List[Dict]) -> None:
+        # A bad batch must not take the background sender down with it
+        try:
+            self.dispatch(events)
+        except Exception as e:
+            print(f"Error dispatching notifications: {e}")
+
+    def _run(self) -> None:
+        while True:
+            events = self._queue.get()
+            if events is None:
+                return
+            # Drain whatever else is waiting so it goes out in the same batches
+            while True:
+                try:
+                    more = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if more is None:
+                    self._dispatch_logged(events)
+                    return
+                events = events + more
+            self._dispatch_logged(events)
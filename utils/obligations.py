@@ -0,0 +1,203 @@
+import pandas as pd
+import numpy as np
+import os
+import threading
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Union
+
+from utils.sms_processor import extract_obligation_event, obligation_key
+
+OBLIGATIONS_PATH = 'data/obligations.csv'
+
+OBLIGATION_EVENT_COLUMNS = ['obligation_id', 'date', 'sender', 'status', 'amount_due',
+                            'dpd', 'due_date', 'code', 'raw_message']
+
+# Obligations with no notice for this long are treated as closed
+STALE_OBLIGATION_DAYS = 120
+
+
+class ObligationIndex:
+    """
+    Loan/policy notices indexed by obligation number
+
+    Events are sorted by (obligation_id, date) once, so an obligation's
+    timeline is a binary-search slice and its summary a row lookup in
+    `table`, without rescanning raw messages.
+    """
+
+    def __init__(self, events: pd.DataFrame):
+        events = events.reindex(columns=OBLIGATION_EVENT_COLUMNS).assign(
+            # Canonical keys also merge events persisted under older, uncanonicalized IDs
+            obligation_id=lambda e: [obligation_key(number, sender) for number, sender
+                                     in zip(e['obligation_id'].astype(str), e['sender'].fillna('').astype(str))],
+            date=lambda e: pd.to_datetime(e['date'], errors='coerce'),
+            due_date=lambda e: pd.to_datetime(e['due_date'], errors='coerce'),
+            amount_due=lambda e: pd.to_numeric(e['amount_due'], errors='coerce'),
+            dpd=lambda e: pd.to_numeric(e['dpd'], errors='coerce').fillna(0).astype(int)
+        )
+        # The same notice uploaded twice is one event
+        events = events.drop_duplicates(subset=['obligation_id', 'date', 'raw_message'])
+        self.events = events.sort_values(['obligation_id', 'date'], kind='stable').reset_index(drop=True)
+        self._ids = self.events['obligation_id'].to_numpy()
+        self.table = self._summarize()
+
+    def _summarize(self) -> pd.DataFrame:
+        grouped = self.events.groupby('obligation_id', sort=True)
+        table = grouped.agg(
+            first_seen=('date', 'min'),
+            last_seen=('date', 'max'),
+            sender=('sender', 'last'),
+            last_status=('status', 'last'),
+            last_dpd=('dpd', 'last'),
+            max_dpd=('dpd', 'max'),
+            amount_due=('amount_due', 'last'),
+            next_due_date=('due_date', 'max'),
+            notices=('date', 'size')
+        )
+        # Reminders can quote charges too; prefer amounts from due/overdue notices
+        dues = self.events[self.events['status'].isin(['due', 'overdue'])]
+        table['amount_due'] = dues.groupby('obligation_id')['amount_due'].last() \
+            .reindex(table.index).fillna(table['amount_due'])
+        table['due_notices'] = dues.groupby('obligation_id').size().reindex(table.index).fillna(0).astype(int)
+        paid = self.events[self.events['status'] == 'paid']
+        table['last_paid'] = paid.groupby('obligation_id')['date'].max().reindex(table.index)
+        return table
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+    def get(self, obligation_id: str) -> Optional[Dict]:
+        """
+        Summary of one obligation: last DPD, amount due, due and payment dates
+        """
+        if obligation_id not in self.table.index:
+            return None
+        return {'obligation_id': obligation_id, **self.table.loc[obligation_id].to_dict()}
+
+    def timeline(self, obligation_id: str) -> pd.DataFrame:
+        """
+        Every notice for an obligation, oldest first
+        """
+        start = np.searchsorted(self._ids, obligation_id, side='left')
+        end = np.searchsorted(self._ids, obligation_id, side='right')
+        return self.events.iloc[start:end]
+
+    def overdue(self) -> pd.DataFrame:
+        return self.table[(self.table['last_status'] == 'overdue') | (self.table['last_dpd'] > 0)]
+
+    def covers(self, raw_messages: pd.Series) -> np.ndarray:
+        """
+        Mask of messages that are already tracked as obligation notices
+        """
+        return raw_messages.isin(self.events['raw_message']).to_numpy(dtype=bool, na_value=False)
+
+    def upcoming(self, today: Optional[datetime] = None, days: int = 7) -> List[Dict]:
+        """
+        Obligations due within `days`, plus ones currently overdue (negative days_left)
+
+        The due date is the latest one a notice stated. Once that installment
+        is paid, the next one is assumed a month later, but only when there is
+        a schedule to project from (a stated due date, or repeated due
+        notices); a payment alone may well have closed the loan. Only
+        obligations whose last notice reports them overdue get a negative
+        days_left.
+        """
+        today = pd.Timestamp(today or datetime.now())
+        upcoming = []
+        for obligation_id, row in self.table.iterrows():
+            if (today - row['last_seen']).days > STALE_OBLIGATION_DAYS:
+                continue
+
+            overdue = row['last_status'] == 'overdue' or row['last_dpd'] > 0
+            scheduled = pd.notna(row['next_due_date']) or row['due_notices'] > 1
+            if overdue:
+                due = row['last_seen'] - pd.Timedelta(days=int(row['last_dpd']))
+            elif pd.notna(row['next_due_date']) and (pd.isna(row['last_paid']) or row['next_due_date'] > row['last_paid']):
+                due = row['next_due_date']
+            elif pd.notna(row['last_paid']) and scheduled:
+                due = (row['next_due_date'] if pd.notna(row['next_due_date']) else row['last_paid']) \
+                    + pd.DateOffset(months=1)
+            else:
+                continue
+
+            days_left = (due - today).days
+            if days_left <= days and (overdue or days_left >= 0):
+                upcoming.append({
+                    'description': f"Loan/policy {obligation_id}" +
+                                   (f" ({row['last_dpd']} days past due)" if row['last_dpd'] else ''),
+                    'amount': float(row['amount_due']) if pd.notna(row['amount_due']) else 0.0,
+                    'due_date': due.strftime('%Y-%m-%d'),
+                    'days_left': days_left,
+                    'obligation_id': obligation_id,
+                    'status': row['last_status']
+                })
+        return upcoming
+
+
+class ObligationStore:
+    """
+    Shared, append-only obligation index; writes publish a new ObligationIndex
+    """
+
+    def __init__(self, events: pd.DataFrame,
+                 persist: Optional[Callable[[pd.DataFrame], None]] = None):
+        self._index = ObligationIndex(events)
+        self._persist = persist
+        self._write_lock = threading.Lock()
+
+    def index(self) -> ObligationIndex:
+        return self._index
+
+    def append(self, events: Union[pd.DataFrame, List[Dict]]) -> ObligationIndex:
+        new_events = pd.DataFrame(events, columns=OBLIGATION_EVENT_COLUMNS)
+        with self._write_lock:
+            if new_events.empty:
+                return self._index
+            updated = ObligationIndex(pd.concat([self._index.events, new_events], ignore_index=True))
+            if self._persist is not None:
+                self._persist(new_events)
+            self._index = updated
+            return updated
+
+
+def extract_obligation_events(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Obligation events from stored transactions' raw messages
+    """
+    events = []
+    if 'raw_message' in df.columns:
+        dates = df['date'] if 'date' in df.columns else pd.Series(pd.NaT, index=df.index)
+        senders = df['sender'] if 'sender' in df.columns else pd.Series('Unknown', index=df.index)
+        for message, date, sender in zip(df['raw_message'].astype(str), dates, senders):
+            event = extract_obligation_event(message, sender)
+            if event is not None:
+                events.append({**event, 'date': date, 'sender': sender})
+    return pd.DataFrame(events, columns=OBLIGATION_EVENT_COLUMNS)
+
+
+def append_obligations(new_events: pd.DataFrame, path: str = OBLIGATIONS_PATH) -> None:
+    try:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        new_events.reindex(columns=OBLIGATION_EVENT_COLUMNS).to_csv(
+            path, mode='a', header=not os.path.exists(path), index=False
+        )
+    except Exception as e:
+        print(f"Error saving obligations: {e}")
+
+
+def load_obligations(history: Optional[pd.DataFrame] = None,
+                     path: str = OBLIGATIONS_PATH) -> ObligationStore:
+    """
+    Load persisted obligation events, or extract them once from the stored history
+    """
+    persist = lambda events: append_obligations(events, path)
+    try:
+        if os.path.exists(path):
+            return ObligationStore(pd.read_csv(path, dtype={'obligation_id': str}), persist=persist)
+    except Exception as e:
+        print(f"Error loading obligations: {e}")
+
+    store = ObligationStore(pd.DataFrame(columns=OBLIGATION_EVENT_COLUMNS), persist=persist)
+    if history is not None and not history.empty:
+        store.append(extract_obligation_events(history))
+    return store
@@ -0,0 +1,100 @@
+import pandas as pd
+import numpy as np
+from typing import Dict, Optional, Tuple
+from utils.deduplication import drop_flagged_duplicates
+
+# Columns that get prefix sums up front; other slices are built on first use
+RANGE_QUERY_DIMENSIONS = ['type', 'category', 'account_type']
+
+
+class RangeQueryEngine:
+    """
+    Answer total/count/mean queries over date ranges in O(log n)
+
+    Transactions are sorted by date once and cumulative sums of amount and
+    row count are kept per slice, so a query is two searchsorted lookups and
+    a subtraction. Ranges are half-open: start is inclusive, end exclusive.
+    """
+
+    def __init__(self, df: pd.DataFrame, dimensions: Optional[list] = None):
+        dimensions = RANGE_QUERY_DIMENSIONS if dimensions is None else dimensions
+        df = drop_flagged_duplicates(df)
+
+        dates = pd.to_datetime(df['date'], errors='coerce') if 'date' in df.columns \
+            else pd.Series(pd.NaT, index=df.index)
+        valid = dates.notna().to_numpy()
+        order = np.argsort(dates.to_numpy(dtype='datetime64[ns]')[valid], kind='stable')
+
+        self._rows = df.loc[valid].iloc[order].reset_index(drop=True)
+        self._dates = dates.to_numpy(dtype='datetime64[ns]')[valid][order]
+        self._amounts = pd.to_numeric(self._rows['amount'], errors='coerce') \
+            .fillna(0).to_numpy(dtype=float)
+
+        self._prefix: Dict[Tuple, Tuple[np.ndarray, np.ndarray]] = {}
+        self._prefix[()] = self._build_prefix(np.ones(len(self._rows), dtype=bool))
+        for dimension in dimensions:
+            if dimension not in self._rows.columns:
+                continue
+            for value in self._rows[dimension].dropna().unique():
+                self._slice_prefix({dimension: value})
+
+    def __len__(self) -> int:
+        return len(self._dates)
+
+    @property
+    def min_date(self) -> Optional[pd.Timestamp]:
+        return pd.Timestamp(self._dates[0]) if len(self._dates) else None
+
+    @property
+    def max_date(self) -> Optional[pd.Timestamp]:
+        return pd.Timestamp(self._dates[-1]) if len(self._dates) else None
+
+    def _build_prefix(self, mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        totals = np.concatenate(([0.0], np.cumsum(np.where(mask, self._amounts, 0.0))))
+        counts = np.concatenate(([0], np.cumsum(mask, dtype=np.int64)))
+        return totals, counts
+
+    def _slice_prefix(self, filters: Dict) -> Tuple[np.ndarray, np.ndarray]:
+        key = tuple(sorted((column, value) for column, value in filters.items()))
+        if key not in self._prefix:
+            mask = np.ones(len(self._rows), dtype=bool)
+            for column, value in key:
+                if column not in self._rows.columns:
+                    mask[:] = False
+                    break
+                # Arrow-backed columns compare to nullable booleans; missing values never match
+                mask &= (self._rows[column] == value).to_numpy(dtype=bool, na_value=False)
+            self._prefix[key] = self._build_prefix(mask)
+        return self._prefix[key]
+
+    def _bounds(self, start, end) -> Tuple[int, int]:
+        lo = 0 if start is None else \
+            np.searchsorted(self._dates, np.datetime64(pd.Timestamp(start), 'ns'), side='left')
+        hi = len(self._dates) if end is None else \
+            np.searchsorted(self._dates, np.datetime64(pd.Timestamp(end), 'ns'), side='left')
+        return int(lo), int(max(hi, lo))
+
+    def query(self, start=None, end=None, **filters) -> Dict[str, float]:
+        """
+        Total, count and mean amount between start and end for a slice
+
+        Filters are column=value pairs, e.g. query(start, end, type='debit').
+        """
+        totals, counts = self._slice_prefix(filters)
+        lo, hi = self._bounds(start, end)
+        total = float(totals[hi] - totals[lo])
+        count = int(counts[hi] - counts[lo])
+        return {
+            'total': total,
+            'count': count,
+            'mean': total / count if count else 0.0
+        }
+
+    def total(self, start=None, end=None, **filters) -> float:
+        return self.query(start, end, **filters)['total']
+
+    def count(self, start=None, end=None, **filters) -> int:
+        return self.query(start, end, **filters)['count']
+
+    def mean(self, start=None, end=None, **filters) -> float:
+        return self.query(start, end, **filters)['mean']
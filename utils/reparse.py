@@ -0,0 +1,202 @@
+import pandas as pd
+import numpy as np
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from models.message_normalizer import normalize_message
+from models.sms_categorizer import categorize_sms
+from models.pattern_fingerprint import (
+    FINGERPRINT_COLUMN,
+    changed_groups,
+    current_fingerprint,
+    group_fingerprints
+)
+from utils.sms_processor import extract_fields
+from utils.transaction_categorizer import categorize_transaction
+from utils.deduplication import flag_duplicates
+
+# Messages sent to a worker process at a time
+REPARSE_BATCH_SIZE = 2000
+
+
+def plan_reparse(df: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """
+    Boolean masks of the rows each stage has to rerun for the current patterns
+
+    Rows are grouped by their stored fingerprint, so the comparison runs once
+    per distinct fingerprint rather than once per row.
+    """
+    n = len(df)
+    fingerprints = df[FINGERPRINT_COLUMN] if FINGERPRINT_COLUMN in df.columns \
+        else pd.Series('', index=df.index)
+    fingerprints = fingerprints.fillna('').astype(str)
+
+    current = group_fingerprints()
+    extract = np.zeros(n, dtype=bool)
+    sms = np.zeros(n, dtype=bool)
+    category = np.zeros(n, dtype=bool)
+
+    codes, uniques = pd.factorize(fingerprints)
+    for code, fingerprint in enumerate(uniques):
+        changed = changed_groups(fingerprint, current)
+        rows = codes == code
+        if changed & {'extraction', 'sender_profiles'}:
+            extract |= rows
+            # A new description can change the category
+            category |= rows
+        if 'sms_categories' in changed:
+            sms |= rows
+        if 'categories' in changed:
+            category |= rows
+
+    return {'extract': extract, 'sms_categories': sms, 'categories': category}
+
+
+def _reparse_batch(batch: Tuple[List[str], List[str], List[bool], List[bool]]) -> List[Optional[Dict]]:
+    """
+    Rerun extraction and/or SMS categorization for a batch of stored messages
+
+    Returns one dict of updated columns per message, or None when the current
+    patterns no longer find an amount.
+    """
+    messages, senders, extract_flags, sms_flags = batch
+    results = []
+    for text, sender, do_extract, do_sms in zip(messages, senders, extract_flags, sms_flags):
+        message = normalize_message(str(text))
+        updates = {}
+        if do_extract:
+            fields = extract_fields(message, sender)
+            if fields['amount'] <= 0:
+                results.append(None)
+                continue
+            updates.update(fields)
+        if do_sms:
+            updates.update(categorize_sms(message))
+        results.append(updates)
+    return results
+
+
+def reparse_transactions(df: pd.DataFrame, workers: Optional[int] = None,
+                         batch_size: int = REPARSE_BATCH_SIZE) -> Tuple[pd.DataFrame, Dict[str, int]]:
+    """
+    Reprocess stored raw messages whose fields depend on changed pattern groups
+
+    Extraction and SMS categorization run in parallel batches across worker
+    processes (workers=1 runs in-process). Category assignment only needs the
+    description and runs in-process. Rows the current patterns can no longer
+    parse keep their old values and fingerprint. Re-extracted amounts,
+    types and references can change which alerts match, so duplicates are
+    flagged again whenever any row was re-extracted.
+    """
+    df = df.reset_index(drop=True).copy()
+    plan = plan_reparse(df)
+    stats = {
+        'rows': len(df),
+        'extracted': int(plan['extract'].sum()),
+        'sms_categorized': int(plan['sms_categories'].sum()),
+        'categorized': 0,
+        'unparsed': 0
+    }
+
+    positions = np.flatnonzero(plan['extract'] | plan['sms_categories'])
+    senders = df['sender'].astype(str) if 'sender' in df.columns else pd.Series('Unknown', index=df.index)
+    batches = [
+        (
+            df['raw_message'].iloc[chunk].astype(str).tolist(),
+            senders.iloc[chunk].tolist(),
+            plan['extract'][chunk].tolist(),
+            plan['sms_categories'][chunk].tolist()
+        )
+        for chunk in (positions[i:i + batch_size] for i in range(0, len(positions), batch_size))
+    ]
+
+    if workers == 1 or len(batches) <= 1:
+        results = [_reparse_batch(batch) for batch in batches]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_reparse_batch, batches))
+
+    stamped = np.zeros(len(df), dtype=bool)
+    stamped[positions] = True
+    unparsed = []
+    updates = {}
+    for position, result in zip(positions, (r for batch in results for r in batch)):
+        if result is None:
+            unparsed.append(position)
+        else:
+            updates[position] = result
+
+    if updates:
+        update_frame = pd.DataFrame.from_dict(updates, orient='index')
+        for column in update_frame.columns:
+            if column not in df.columns:
+                df[column] = pd.Series(pd.NA, index=df.index, dtype='object')
+            df[column] = df[column].astype('object')
+            df.iloc[update_frame.index, df.columns.get_loc(column)] = update_frame[column].to_numpy()
+
+    category_rows = plan['categories'].copy()
+    category_rows[unparsed] = False
+    category_positions = np.flatnonzero(category_rows)
+    if len(category_positions):
+        descriptions = df['description'].iloc[category_positions].astype(str)
+        df.iloc[category_positions, df.columns.get_loc('category')] = \
+            descriptions.map(categorize_transaction).to_numpy()
+    stats['categorized'] = len(category_positions)
+
+    stamped |= plan['categories']
+    stamped[unparsed] = False
+    if FINGERPRINT_COLUMN not in df.columns:
+        df[FINGERPRINT_COLUMN] = ''
+    df.loc[stamped, FINGERPRINT_COLUMN] = current_fingerprint()
+    stats['unparsed'] = len(unparsed)
+
+    if updates and plan['extract'].any():
+        df = flag_duplicates(df)
+
+    return df, stats
+
+
+def reparse_store(store, workers: Optional[int] = None,
+                  batch_size: int = REPARSE_BATCH_SIZE) -> Dict[str, int]:
+    """
+    Re-parse the shared store and publish the result as a new snapshot
+
+    Rows appended while the re-parse runs are kept as they are.
+    """
+    base = store.snapshot()
+    updated, stats = reparse_transactions(base.data, workers=workers, batch_size=batch_size)
+    store.replace_prefix(base, updated)
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Re-parse stored messages after pattern changes")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument('--batch-size', type=int, default=REPARSE_BATCH_SIZE)
+    parser.add_argument('--dry-run', action='store_true', help="only report how many rows would change")
+    args = parser.parse_args()
+
+    from utils.data_manager import load_data, append_data, lock_store
+    from utils.transaction_store import TransactionStore
+
+    if args.dry_run:
+        df = load_data()
+        plan = plan_reparse(df)
+        print(f"rows={len(df)} extract={int(plan['extract'].sum())} "
+              f"sms_categories={int(plan['sms_categories'].sum())} categories={int(plan['categories'].sum())}")
+        return
+
+    # A running dashboard would overwrite the result with its in-memory rows
+    lock = lock_store()
+    if lock is None:
+        parser.exit(1, "The transaction store is in use by a running dashboard; "
+                       "use its 'Re-parse stored messages' button instead.\n")
+    with lock:
+        store = TransactionStore(load_data(), persist=append_data)
+        stats = reparse_store(store, workers=args.workers, batch_size=args.batch_size)
+    print(' '.join(f"{key}={value}" for key, value in stats.items()))
+
+
+if __name__ == '__main__':
+    main()
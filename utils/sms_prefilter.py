@@ -0,0 +1,315 @@
+import pandas as pd
+import numpy as np
+import argparse
+import os
+import re
+import zlib
+from typing import Dict, List, Optional, Tuple, Union
+from models.message_normalizer import NormalizedMessage, normalize_message
+
+PREFILTER_MODEL_PATH = 'models/sms_prefilter.npz'
+
+# Size of the hashed feature space
+PREFILTER_FEATURES = 2 ** 16
+
+# Score above which a message is sent on to full extraction
+PREFILTER_THRESHOLD = 0.3
+
+# Share of financial messages the tuned threshold must let through
+PREFILTER_TARGET_RECALL = 0.995
+
+# High-recall fallback used when no trained model is available (matched on normalized text)
+FINANCIAL_KEYWORDS = re.compile(
+    r"debit|credit|a/c|acct|account|upi|txn|transaction|spent|paid|payment|received|"
+    r"withdrawn|withdrawal|refund|emi|loan|due|balance|bal\b|neft|imps|rtgs|transfer|"
+    r"salary|deposit|card|wallet|bill|invest|sip|premium|policy"
+)
+
+
+# Wording that marks a message with an amount as a completed or billed transaction
+# rather than an offer (matched on normalized text)
+TRANSACTION_EVIDENCE = re.compile(
+    r"success|processed|\bpaid\b|received|submitted|debited|credited|deducted|withdrawn|transferred|"
+    r"\btxn\b|transaction\s*id|order\s*id|invoice|\bdue\b|overdue|refund|सफलतापूर्वक|डेबिट|क्रेडिट"
+)
+
+# Curated non-financial messages (OTPs, promotions, delivery and service notices).
+# Stored rows all quote an amount, so without these the model never sees an OTP.
+NON_FINANCIAL_EXAMPLES = [
+    "123456 is your OTP for login. Do not share it with anyone. Valid for 10 minutes.",
+    "Your OTP for transaction is 482913. OTP is valid for 5 mins. Never share your OTP with anyone.",
+    "Use 7731 as your verification code for Swiggy. Code expires in 10 min.",
+    "<#> 845120 is your Amazon OTP. Do not share it with anyone. Abc12XyZ9",
+    "Dear Customer, OTP to login to mobile banking is 660341. Do not share this OTP with anyone for security reasons.",
+    "Your one time password to reset your password is 902114 and is valid for 3 minutes.",
+    "G-482101 is your Google verification code.",
+    "Your WhatsApp code: 482-119. Don't share this code with others.",
+    "Dear user, 5521 is the OTP to verify your email address on Zomato.",
+    "Never share your card PIN, CVV or OTP with anyone. Bank officials will never ask for them.",
+    "Beware of fraudsters! Bank never asks for OTP, PIN or password over call or SMS.",
+    "Flat 50% OFF on your next order! Use code SAVE50. Offer valid till Sunday. T&C apply.",
+    "Mega sale is LIVE! Up to 80% off on electronics and fashion. Shop now on the app.",
+    "Get unlimited calls and 2GB/day data with our new plan. Recharge now!",
+    "You have won a voucher! Click the link to claim before it expires.",
+    "Exclusive offer for you: upgrade to our premium membership at a special price. Reply YES.",
+    "Your favourite restaurant is now delivering in your area. Order now and get free delivery.",
+    "Hurry! Last 2 days of the end of season sale. Visit your nearest store today.",
+    "Congratulations! You are pre-approved for an exclusive offer. Visit our website to know more.",
+    "New arrivals are here! Check out the latest collection in stores and online.",
+    "Your order #408-1123 has been shipped and will be delivered by Thursday.",
+    "Your package is out for delivery today. Track it on the app.",
+    "Your order has been delivered. Rate your experience on the app.",
+    "Your cab is arriving in 3 mins. Driver: Ramesh, KA01AB1234.",
+    "Your appointment with Dr. Mehta is confirmed for 10:30 AM on 12 March.",
+    "Your PNR 4521876543 is confirmed. Train 12627 departs at 21:15 from platform 3.",
+    "Your flight 6E-2134 is on time. Web check-in is now open.",
+    "Data usage alert: you have used 90% of your daily data quota.",
+    "Your mobile number has been successfully linked to your Aadhaar.",
+    "Thank you for contacting customer care. Your complaint number is 8842231.",
+    "Dear Customer, your KYC is due for update. Please visit your nearest branch with documents.",
+    "Your new debit card has been dispatched and will reach you in 5 working days.",
+    "Your request for a cheque book has been registered and will be delivered shortly.",
+    "Your password was changed successfully. If this was not you, call customer care.",
+    "Login to net banking detected from a new device at 10:42. If not you, call us.",
+    "Hi, are you coming for dinner tonight? Let me know by 7.",
+    "Happy birthday! Wishing you a wonderful year ahead.",
+    "Power supply will be interrupted in your area tomorrow from 10 AM to 2 PM for maintenance.",
+    "Your vaccination certificate is ready to download.",
+    "Reminder: your meeting starts at 3 PM today.",
+]
+
+
+def _tokens(message: Union[str, NormalizedMessage]) -> List[str]:
+    """
+    Lowercased word tokens and bigrams, with every number collapsed to one token
+    """
+    words = ['0' if t.isdigit() else t for t in normalize_message(message).words]
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def hash_features(messages: List[Union[str, NormalizedMessage]], n_features: int = PREFILTER_FEATURES) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Hash a batch of messages into sparse (row, feature) index arrays
+    """
+    rows = []
+    cols = []
+    for i, message in enumerate(messages):
+        features = {zlib.crc32(token.encode('utf-8')) % n_features for token in _tokens(message)}
+        rows.extend([i] * len(features))
+        cols.extend(features)
+    return np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64)
+
+
+class SmsPrefilter:
+    """
+    Cheap financial/non-financial gate run before full regex extraction
+
+    Scores a batch with a logistic model over hashed token features. Without
+    trained weights it falls back to a keyword match.
+    """
+
+    def __init__(self, weights: Optional[np.ndarray] = None, bias: float = 0.0,
+                 threshold: float = PREFILTER_THRESHOLD):
+        self.weights = weights
+        self.bias = bias
+        self.threshold = threshold
+
+    @property
+    def trained(self) -> bool:
+        return self.weights is not None
+
+    def score(self, messages: List[Union[str, NormalizedMessage]]) -> np.ndarray:
+        """
+        Probability that each message is financial
+        """
+        messages = list(messages)
+        if not self.trained:
+            return np.array([1.0 if FINANCIAL_KEYWORDS.search(normalize_message(m).text) else 0.0
+                             for m in messages])
+
+        rows, cols = hash_features(messages, len(self.weights))
+        logits = np.bincount(rows, weights=self.weights[cols], minlength=len(messages)) + self.bias
+        return 1.0 / (1.0 + np.exp(-logits))
+
+    def predict(self, messages: List[Union[str, NormalizedMessage]]) -> np.ndarray:
+        """
+        Boolean mask of messages worth full extraction
+        """
+        return self.score(messages) >= self.threshold
+
+    def save(self, path: str = PREFILTER_MODEL_PATH) -> None:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        np.savez_compressed(path, weights=self.weights, bias=self.bias, threshold=self.threshold)
+
+
+def train_prefilter(messages: List[str], labels: np.ndarray, n_features: int = PREFILTER_FEATURES,
+                    epochs: int = 200, learning_rate: float = 0.5, l2: float = 1e-4,
+                    threshold: float = PREFILTER_THRESHOLD) -> SmsPrefilter:
+    """
+    Fit logistic regression on hashed features with full-batch Adagrad
+    """
+    labels = np.asarray(labels, dtype=float)
+    rows, cols = hash_features(messages, n_features)
+    n = len(labels)
+
+    weights = np.zeros(n_features)
+    bias = 0.0
+    grad_sq = np.full(n_features, 1e-8)
+    bias_sq = 1e-8
+
+    # Weight the rarer class up so recall on financial messages does not suffer
+    positive_rate = labels.mean() if n else 0.5
+    sample_weight = np.where(labels == 1, 0.5 / max(positive_rate, 1e-6), 0.5 / max(1 - positive_rate, 1e-6))
+
+    for _ in range(epochs):
+        logits = np.bincount(rows, weights=weights[cols], minlength=n) + bias
+        error = (1.0 / (1.0 + np.exp(-logits)) - labels) * sample_weight / n
+
+        grad = np.bincount(cols, weights=error[rows], minlength=n_features) + l2 * weights
+        grad_sq += grad ** 2
+        weights -= learning_rate * grad / np.sqrt(grad_sq)
+
+        bias_grad = error.sum()
+        bias_sq += bias_grad ** 2
+        bias -= learning_rate * bias_grad / np.sqrt(bias_sq)
+
+    return SmsPrefilter(weights, bias, threshold)
+
+
+def evaluate_prefilter(prefilter: SmsPrefilter, messages: List[str], labels: np.ndarray) -> Dict[str, float]:
+    """
+    Precision, recall and pass-through rate of the gate on labelled messages
+    """
+    labels = np.asarray(labels, dtype=bool)
+    predicted = prefilter.predict(messages)
+    true_positive = int((predicted & labels).sum())
+    return {
+        'precision': true_positive / max(int(predicted.sum()), 1),
+        'recall': true_positive / max(int(labels.sum()), 1),
+        'pass_rate': float(predicted.mean()) if len(predicted) else 0.0
+    }
+
+
+def label_messages(messages: List[Union[str, NormalizedMessage]],
+                   senders: Optional[List[str]] = None) -> np.ndarray:
+    """
+    Label messages financial when extraction finds an amount backed by transaction evidence
+
+    Evidence is a debit/credit type, reference number, account number,
+    reported balance or loan/policy notice, or transaction wording such as
+    "successful" or "Transaction ID". Offers quoting a price ("Recharge now
+    with Rs349") have an amount but none of these, and are the negatives.
+    """
+    # Imported here: sms_processor depends on this module
+    from utils.sms_processor import extract_fields, extract_obligation_event
+
+    senders = senders if senders is not None else ['Unknown'] * len(messages)
+    labels = []
+    for message, sender in zip(messages, senders):
+        message = normalize_message(message)
+        fields = extract_fields(message, str(sender))
+        evidence = (
+            fields['type'] in ('debit', 'credit')
+            or bool(fields['reference_number'])
+            or bool(fields['account_number'])
+            or pd.notna(fields['available_balance'])
+            or TRANSACTION_EVIDENCE.search(message.text) is not None
+            or extract_obligation_event(message) is not None
+        )
+        labels.append(fields['amount'] > 0 and evidence)
+    return np.asarray(labels, dtype=bool)
+
+
+def tune_threshold(prefilter: SmsPrefilter, messages: List[str], labels: np.ndarray,
+                   target_recall: float = PREFILTER_TARGET_RECALL) -> float:
+    """
+    Highest threshold (at most the current one) that keeps target_recall of the financial messages
+    """
+    labels = np.asarray(labels, dtype=bool)
+    scores = prefilter.score(messages)[labels]
+    if not len(scores):
+        return prefilter.threshold
+    # Scores at or above the (1 - target_recall) quantile of positives pass
+    cutoff = float(np.quantile(scores, 1 - target_recall, method='lower'))
+    return min(prefilter.threshold, cutoff)
+
+
+def load_training_messages(path: str) -> Tuple[List[str], List[str]]:
+    """
+    Message texts and senders from stored transactions or a raw SMS export (CSV or Android XML backup)
+    """
+    from utils.importers import get_importer
+
+    df = pd.concat(get_importer(path).iter_batches(path), ignore_index=True)
+    text_col = 'raw_message' if 'raw_message' in df.columns else \
+        next((c for c in df.columns if any(x in c.lower() for x in ['text', 'sms', 'message', 'body', 'content'])), None)
+    if text_col is None:
+        raise ValueError(f"No SMS text column found in {path}")
+    sender_col = 'sender' if 'sender' in df.columns else 'address' if 'address' in df.columns else None
+
+    messages = df[text_col].fillna('').astype(str).tolist()
+    senders = df[sender_col].fillna('Unknown').astype(str).tolist() if sender_col else ['Unknown'] * len(df)
+    return messages, senders
+
+
+def load_prefilter(path: str = PREFILTER_MODEL_PATH, threshold: Optional[float] = None) -> SmsPrefilter:
+    """
+    Load trained weights, falling back to the keyword gate
+    """
+    prefilter = SmsPrefilter()
+    try:
+        if os.path.exists(path):
+            data = np.load(path)
+            prefilter = SmsPrefilter(data['weights'], float(data['bias']), float(data['threshold']))
+    except Exception as e:
+        print(f"Error loading prefilter model: {e}")
+
+    if threshold is not None:
+        prefilter.threshold = threshold
+    return prefilter
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Train the non-financial SMS prefilter")
+    parser.add_argument('--data', default='data/transactions.csv',
+                        help="Stored transactions, or a raw SMS export (CSV or Android XML backup)")
+    parser.add_argument('--out', default=PREFILTER_MODEL_PATH)
+    parser.add_argument('--target-recall', type=float, default=PREFILTER_TARGET_RECALL,
+                        help="Share of financial messages the tuned threshold must keep")
+    parser.add_argument('--calibration', type=float, default=0.2,
+                        help="Share of messages held out to tune the threshold")
+    parser.add_argument('--holdout', type=float, default=0.2,
+                        help="Share of messages held out to report metrics on")
+    args = parser.parse_args()
+
+    messages, senders = load_training_messages(args.data)
+    labels = label_messages(messages, senders)
+    # Stored rows include price offers; the curated examples add OTPs and service notices
+    messages = messages + NON_FINANCIAL_EXAMPLES
+    labels = np.concatenate([labels, np.zeros(len(NON_FINANCIAL_EXAMPLES), dtype=bool)])
+
+    # The threshold is tuned on its own split so the reported metrics come from unseen messages
+    order = np.random.default_rng(0).permutation(len(messages))
+    test_start = int(len(order) * (1 - args.holdout))
+    calibration_start = int(len(order) * (1 - args.holdout - args.calibration))
+    train, calibration, test = np.split(order, [calibration_start, test_start])
+    train_messages, train_labels = [messages[i] for i in train], labels[train]
+    calibration_messages, calibration_labels = [messages[i] for i in calibration], labels[calibration]
+    test_messages, test_labels = [messages[i] for i in test], labels[test]
+    print(f"{int(labels.sum())} financial and {int((~labels).sum())} non-financial messages "
+          f"({len(train)} train, {len(calibration)} calibration, {len(test)} test)")
+
+    prefilter = train_prefilter(train_messages, train_labels)
+    prefilter.threshold = tune_threshold(prefilter, calibration_messages, calibration_labels,
+                                         args.target_recall)
+    for name, gate in [('model', prefilter), ('keywords', SmsPrefilter())]:
+        metrics = evaluate_prefilter(gate, test_messages, test_labels)
+        print(f"{name}: precision={metrics['precision']:.3f} recall={metrics['recall']:.3f} "
+              f"pass_rate={metrics['pass_rate']:.3f}")
+
+    prefilter.save(args.out)
+    print(f"Saved prefilter to {args.out} (threshold {prefilter.threshold:.3f})")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,19 +1,51 @@
 import pandas as pd
 import numpy as np
-from typing import Dict, List
+from typing import Dict, List, Optional, Union
 import re
 from datetime import datetime
-from models.regex_patterns import REGEX_MAP, REGEX_MAP_PRE, REGEX_MAP_POST, TRANSACTION_PATTERNS
+from models.regex_patterns import REGEX_MAP, OBLIGATION_PATTERNS
 from models.sms_categorizer import categorize_sms
+from models.sender_profiles import SENDER_PROFILES, DIRECTION_TYPES, normalize_sender, sender_bank
+from models.message_normalizer import NormalizedMessage, NormalizedPattern, normalize_message
+from utils.sms_prefilter import SmsPrefilter
 
-def process_sms_data(df: pd.DataFrame) -> pd.DataFrame:
+# Extraction patterns compiled once for matching against normalized text
+_PATTERNS = {
+    name: NormalizedPattern(REGEX_MAP[name])
+    for name in ['amount', 'time', 'transactioncurrency', 'utrnumber',
+                 'debit', 'credit', 'upi', 'netbanking', 'creditcard', 'autodebit',
+                 'availablebalance', 'maskedaccount']
+}
+
+# UPI IDs are lowercase, so match them case-sensitively on the original text;
+# on lowercased text "Offer@SMART" or "GIFT@Rs" would pass for one
+_UPI_ID = re.compile(REGEX_MAP['upiid'])
+
+# Obligation entities matched in one scan; the outer group keeps every branch in the Latin variant
+_OBLIGATION_SCAN = NormalizedPattern(
+    '(?:' + '|'.join(f"(?P<{name}>{pattern})" for name, pattern in OBLIGATION_PATTERNS.items()) + ')'
+)
+# Index of the first capture group inside each named branch, and how many there are
+_OBLIGATION_GROUPS = {}
+_group_index = 1
+for _name, _pattern in OBLIGATION_PATTERNS.items():
+    _inner = re.compile(_pattern).groups
+    _OBLIGATION_GROUPS[_name] = (_group_index + 1, _inner)
+    _group_index += 1 + _inner
+
+def process_sms_data(df: pd.DataFrame, prefilter: Optional[SmsPrefilter] = None,
+                     obligation_events: Optional[List[Dict]] = None) -> pd.DataFrame:
     """
     Process raw SMS data using ML models for classification
+
+    When a prefilter is given, messages it scores as non-financial skip extraction.
+    When obligation_events is given, loan/policy notices found in any message
+    (with or without a transaction amount) are appended to it.
     """
     # Detect SMS text column
     text_columns = [col for col in df.columns if any(x in col.lower() for x in ['text', 'sms', 'message', 'body', 'content'])]
     date_columns = [col for col in df.columns if any(x in col.lower() for x in ['date', 'time', 'timestamp', 'time_in_millis'])]
-    sender_columns = [col for col in df.columns if any(x in col.lower() for x in ['sender', 'from', 'number', 'source'])]
+    sender_columns = [col for col in df.columns if any(x in col.lower() for x in ['sender', 'from', 'number', 'source', 'address'])]
 
     if not text_columns:
         raise ValueError("No SMS text column found in the data. Expected columns containing 'text', 'sms', 'message', 'body', or 'content'")
@@ -22,74 +54,164 @@ def process_sms_data(df: pd.DataFrame) -> pd.DataFrame:
     date_col = date_columns[0] if date_columns else None
     sender_col = sender_columns[0] if sender_columns else None
 
-    processed_data = []
+    # Normalize each message once; every later stage reuses it
+    messages = [normalize_message(str(text)) for text in df[text_col]]
+
+    # Obligation notices rarely look like transactions, so scan before the prefilter
+    if obligation_events is not None:
+        for message, (_, row) in zip(messages, df.iterrows()):
+            sender = row[sender_col] if sender_col else 'Unknown'
+            event = extract_obligation_event(message, sender)
+            if event is not None:
+                event['date'] = parse_sms_timestamp(row[date_col]) if date_col else pd.Timestamp.now()
+                event['sender'] = sender
+                obligation_events.append(event)
 
-    for _, row in df.iterrows():
-        # Extract transaction details using regex
-        message_text = str(row[text_col])
-        transaction_details = extract_transaction_details(message_text)
+    if prefilter is not None and messages:
+        keep = prefilter.predict(messages)
+        df = df[keep]
+        messages = [message for message, kept in zip(messages, keep) if kept]
+
+    processed_data = []
 
-        # Get SMS categories
-        categories = categorize_sms(message_text)
+    for message, (_, row) in zip(messages, df.iterrows()):
+        sender = row[sender_col] if sender_col else 'Unknown'
+        fields = extract_fields(message, sender)
 
-        if transaction_details.get('amount', 0) > 0:  # Only process if amount is found
+        if fields['amount'] > 0:  # Only process if amount is found
             transaction_data = {
-                'amount': transaction_details['amount'],
-                'type': transaction_details['type'],
-                'description': transaction_details['description'],
-                'raw_message': message_text,
-                'transaction_currency': transaction_details.get('currency', 'INR'),
-                'upi_id': transaction_details.get('upi_id', ''),
-                'reference_number': transaction_details.get('reference', ''),
-                'transaction_time': transaction_details.get('time', ''),
-                'mode': transaction_details.get('mode', 'unknown'),
+                **fields,
+                'raw_message': message.raw,
                 # Add categorizations
-                'sms_type': categories['sms_type'],
-                'account_type': categories['account_type'],
-                'sms_subtype': categories['sms_subtype'],
-                'transaction_type': categories['transaction_type'],
-                'transaction_channel': categories['transaction_channel']
+                **categorize_sms(message)
             }
 
             # Add date if available
-            if date_col:
-                try:
-                    timestamp = row[date_col]
-                    # Convert string to numeric if it's a string
-                    if isinstance(timestamp, str):
-                        timestamp = float(timestamp)
-
-                    # Check if timestamp is in milliseconds (13 digits) or seconds (10 digits)
-                    if timestamp > 1e12:  # Milliseconds
-                        transaction_data['date'] = pd.Timestamp(timestamp, unit='ms')
-                    else:  # Seconds
-                        transaction_data['date'] = pd.Timestamp(timestamp, unit='s')
-                except Exception as e:
-                    # Fallback to current time if conversion fails
-                    print(f"Date conversion error for {row[date_col]}: {str(e)}")
-                    transaction_data['date'] = pd.Timestamp.now()
-            else:
-                transaction_data['date'] = pd.Timestamp.now()
-
-            # Add sender if available
-            if sender_col:
-                transaction_data['sender'] = row[sender_col]
-            else:
-                transaction_data['sender'] = 'Unknown'
+            transaction_data['date'] = parse_sms_timestamp(row[date_col]) if date_col else pd.Timestamp.now()
+
+            transaction_data['sender'] = sender
 
             processed_data.append(transaction_data)
 
     if not processed_data:
         return pd.DataFrame(columns=['date', 'amount', 'type', 'description', 'sender', 'raw_message',
                                    'transaction_currency', 'upi_id', 'reference_number', 'transaction_time', 'mode',
-                                   'sms_type', 'account_type', 'sms_subtype', 'transaction_type', 'transaction_channel'])
+                                   'parser_profile', 'account_number', 'available_balance', 'sms_type', 'account_type', 'sms_subtype', 'transaction_type', 'transaction_channel'])
 
     return pd.DataFrame(processed_data)
 
-def extract_transaction_details(message: str) -> Dict:
+def parse_sms_timestamp(timestamp) -> pd.Timestamp:
+    """
+    Convert an epoch timestamp in seconds or milliseconds, falling back to now
+    """
+    try:
+        # Convert string to numeric if it's a string
+        if isinstance(timestamp, str):
+            timestamp = float(timestamp)
+
+        # Check if timestamp is in milliseconds (13 digits) or seconds (10 digits)
+        if timestamp > 1e12:  # Milliseconds
+            return pd.Timestamp(timestamp, unit='ms')
+        return pd.Timestamp(timestamp, unit='s')
+    except Exception as e:
+        # Fallback to current time if conversion fails
+        print(f"Date conversion error for {timestamp}: {str(e)}")
+        return pd.Timestamp.now()
+
+# Columns produced by extraction; they change when regex patterns or sender profiles change
+EXTRACTION_FIELDS = ['amount', 'type', 'description', 'transaction_currency', 'upi_id',
+                     'reference_number', 'transaction_time', 'mode', 'parser_profile',
+                     'account_number', 'available_balance']
+
+def extract_fields(message: Union[str, NormalizedMessage], sender: str) -> Dict:
+    """
+    Extract the stored transaction columns for one message
+    """
+    # Try the sender's bank-specific templates before the generic patterns
+    details = extract_with_sender_profile(message, sender)
+    if details is None:
+        details = extract_transaction_details(message)
+
+    # Sender templates may not capture the account or balance; use the generic patterns then
+    account = details.get('account') or extract_account_number(message)
+    balance = details.get('balance')
+    balance = parse_amount(balance) if balance else extract_available_balance(message)
+
+    return {
+        'amount': details['amount'],
+        'type': details['type'],
+        'description': details['description'],
+        'transaction_currency': details.get('currency', 'INR'),
+        'upi_id': details.get('upi_id', ''),
+        'reference_number': details.get('reference', ''),
+        'transaction_time': details.get('time', ''),
+        'mode': details.get('mode', 'unknown'),
+        'parser_profile': details.get('profile', 'generic'),
+        'account_number': mask_account_number(account),
+        'available_balance': balance
+    }
+
+def extract_with_sender_profile(message: Union[str, NormalizedMessage], sender: str) -> Optional[Dict]:
+    """
+    Extract transaction details with the sender's templates in a single match
+
+    Returns None when the sender has no profile or no template matches, so the
+    caller can fall back to extract_transaction_details.
+    """
+    templates = SENDER_PROFILES.get(normalize_sender(sender))
+    if not templates:
+        return None
+
+    # Templates capture names, so they run on the original text
+    message = normalize_message(message).raw
+
+    for template in templates:
+        match = template['pattern'].search(message)
+        if not match:
+            continue
+
+        fields = {**template['fields'], **{k: v for k, v in match.groupdict().items() if v}}
+        try:
+            amount = float(fields['amount'].replace(',', ''))
+        except (KeyError, ValueError):
+            continue
+
+        direction = fields.get('direction', '').lower()
+        return {
+            'amount': amount,
+            'type': fields.get('type', DIRECTION_TYPES.get(direction, 'unknown')),
+            'description': fields.get('counterparty', '').strip() or extract_description(message),
+            'currency': 'INR',
+            'upi_id': fields.get('upi_id', ''),
+            'reference': fields.get('reference', ''),
+            'time': fields.get('time', ''),
+            'mode': fields.get('mode', 'unknown'),
+            'account': fields.get('account', ''),
+            'balance': fields.get('balance', ''),
+            'profile': template['name']
+        }
+
+    return None
+
+def sender_coverage(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Share of each sender's transactions parsed by a sender-specific template
+    """
+    if df.empty or 'parser_profile' not in df.columns:
+        return pd.DataFrame(columns=['sender', 'messages', 'profile_matched', 'coverage'])
+
+    senders = df['sender'].astype(str).map(normalize_sender)
+    matched = df['parser_profile'].fillna('generic') != 'generic'
+    coverage = pd.DataFrame({'sender': senders, 'matched': matched}).groupby('sender')['matched'] \
+        .agg(messages='size', profile_matched='sum').reset_index()
+    coverage['coverage'] = (coverage['profile_matched'] / coverage['messages']).round(3)
+    return coverage.sort_values('messages', ascending=False).reset_index(drop=True)
+
+def extract_transaction_details(message: Union[str, NormalizedMessage]) -> Dict:
     """
     Extract all transaction details from SMS using enhanced regex patterns
     """
+    message = normalize_message(message)
     details = {
         'amount': 0,
         'type': 'unknown',
@@ -102,7 +224,7 @@ def extract_transaction_details(message: str) -> Dict:
     }
 
     # Extract amount
-    amount_match = re.search(REGEX_MAP_PRE['amount'], message, re.IGNORECASE)
+    amount_match = _PATTERNS['amount'].search(message)
     if amount_match:
         amount_str = amount_match.group(1).replace(',', '')
         try:
@@ -111,48 +233,154 @@ def extract_transaction_details(message: str) -> Dict:
             pass
 
     # Extract transaction type
-    if re.search(TRANSACTION_PATTERNS['debit'], message, re.IGNORECASE):
+    if _PATTERNS['debit'].search(message):
         details['type'] = 'debit'
-    elif re.search(TRANSACTION_PATTERNS['credit'], message, re.IGNORECASE):
+    elif _PATTERNS['credit'].search(message):
         details['type'] = 'credit'
 
     # Extract transaction mode
-    if re.search(TRANSACTION_PATTERNS['upi'], message, re.IGNORECASE):
+    if _PATTERNS['upi'].search(message):
         details['mode'] = 'UPI'
-    elif re.search(TRANSACTION_PATTERNS['netbanking'], message, re.IGNORECASE):
+    elif _PATTERNS['netbanking'].search(message):
         details['mode'] = 'Net Banking'
-    elif re.search(TRANSACTION_PATTERNS['creditcard'], message, re.IGNORECASE):
+    elif _PATTERNS['creditcard'].search(message):
         details['mode'] = 'Credit Card'
-    elif re.search(TRANSACTION_PATTERNS['autodebit'], message, re.IGNORECASE):
+    elif _PATTERNS['autodebit'].search(message):
         details['mode'] = 'Auto Debit'
 
     # Extract UPI ID
-    upi_match = re.search(REGEX_MAP_PRE['upiid'], message)
+    upi_match = _UPI_ID.search(message.raw)
     if upi_match:
         details['upi_id'] = upi_match.group(1)
 
     # Extract transaction time
-    time_match = re.search(REGEX_MAP_PRE['time'], message)
+    time_match = _PATTERNS['time'].search(message)
     if time_match:
         details['time'] = time_match.group(0)
 
     # Extract currency
-    currency_match = re.search(REGEX_MAP_PRE['transactioncurrency'], message, re.IGNORECASE)
+    currency_match = _PATTERNS['transactioncurrency'].search(message)
     if currency_match:
         details['currency'] = currency_match.group(1).upper()
 
     # Extract reference number
-    ref_match = re.search(REGEX_MAP_POST['utrnumber'], message, re.IGNORECASE)
+    ref_match = _PATTERNS['utrnumber'].search(message)
     if ref_match:
-        details['reference'] = ref_match.group(0)
+        # UTR numbers are upper-case identifiers
+        details['reference'] = ref_match.group(0).upper()
 
     # Extract description
-    description = extract_description(message)
+    description = extract_description(message.raw)
     if description:
         details['description'] = description
 
     return details
 
+def parse_amount(value: str) -> Optional[float]:
+    """Parse an amount like '1,418.66', returning None when it is not a number"""
+    try:
+        return float(str(value).replace(',', ''))
+    except ValueError:
+        return None
+
+def extract_available_balance(message: Union[str, NormalizedMessage]) -> Optional[float]:
+    """Extract the balance the bank reports after the transaction, e.g. 'Avl Bal INR 52.68'"""
+    match = _PATTERNS['availablebalance'].search(normalize_message(message))
+    return parse_amount(match.group(1)) if match else None
+
+def extract_account_number(message: Union[str, NormalizedMessage]) -> str:
+    """Extract the masked account number, e.g. 'A/cX8589' or 'a/c no ****8589'"""
+    match = _PATTERNS['maskedaccount'].search(normalize_message(message))
+    return (match.group(1) or match.group(2)) if match else ''
+
+def mask_account_number(account: str) -> str:
+    """
+    Canonical account key 'X' + last four digits
+
+    Banks mask different prefixes of the same account (XXXXX068589, X8589),
+    so only the trailing digits identify it.
+    """
+    digits = re.sub(r'\D', '', str(account or ''))
+    return f"X{digits[-4:]}" if digits else ''
+
+def extract_obligation_entities(message: Union[str, NormalizedMessage]) -> Dict[str, List[str]]:
+    """
+    Loan/policy numbers, days past due, due dates, statuses, amounts and codes in one scan
+    """
+    entities: Dict[str, List[str]] = {}
+    for match in _OBLIGATION_SCAN.finditer(normalize_message(message)):
+        name = match.lastgroup
+        first, count = _OBLIGATION_GROUPS[name]
+        value = next((match.group(i) for i in range(first, first + count) if match.group(i)), match.group(name))
+        entities.setdefault(name, []).append(value.strip())
+    return entities
+
+def account_key(number: str, sender: str = '') -> str:
+    """
+    Canonical account ID: the bank behind the sender and the number's last four digits
+
+    The last four digits alone collide across banks (an SBI and an HDFC
+    account can both end in 8589), and one bank alerts from several sender
+    IDs, so the bank code keeps accounts apart without splitting them by
+    channel. Applying it to an ID it produced returns the same ID.
+    """
+    number = str(number)
+    bank, _, number = number.rpartition(':') if ':' in number else (sender, '', number)
+    masked = mask_account_number(number)
+    if not masked:
+        return number.upper()
+    bank = sender_bank(bank) if bank and bank != 'Unknown' else ''
+    return f"{bank}:{masked}" if bank else masked
+
+def obligation_key(number: str, sender: str = '') -> str:
+    """
+    Canonical obligation ID: the lender (sender) and the number's last four digits
+
+    Lenders quote the same loan in full ("LAN 117453863") and masked
+    ("a/c no ****3863"), so only the trailing digits are comparable; the
+    lender keeps different lenders' numbers apart.
+    """
+    return account_key(number, sender)
+
+def extract_obligation_event(message: Union[str, NormalizedMessage], sender: str = '') -> Optional[Dict]:
+    """
+    Describe a loan/policy notice keyed by its obligation number, or None if it names none
+    """
+    entities = extract_obligation_entities(message)
+    keys = entities.get('loannumber', []) + entities.get('generalpan', [])
+    if not keys:
+        return None
+
+    obligation_id = obligation_key(keys[0], sender)
+
+    statuses = {re.sub(r"\s+", ' ', status) for status in entities.get('status', [])}
+    dpd = max((int(days) for days in entities.get('dpd', []) if days.isdigit()), default=0)
+    if dpd or statuses & {'bounced', 'overdue', 'past due'}:
+        status = 'overdue'
+    elif statuses & {'received', 'paid'}:
+        status = 'paid'
+    elif 'due' in statuses or 'duedate' in entities:
+        status = 'due'
+    else:
+        status = 'notice'
+
+    amounts = [parse_amount(re.sub(r"[^\d,\.]", '', value).strip('.'))
+               for value in entities.get('generalamount', []) + entities.get('amount', [])]
+    amounts = [amount for amount in amounts if amount]
+
+    due_dates = [pd.to_datetime(value, dayfirst=True, errors='coerce') for value in entities.get('duedate', [])]
+    due_dates = [date for date in due_dates if pd.notna(date)]
+
+    return {
+        'obligation_id': obligation_id,
+        'status': status,
+        'amount_due': amounts[0] if amounts else None,
+        'dpd': dpd,
+        'due_date': due_dates[0] if due_dates else pd.NaT,
+        'code': entities['generalcode'][0] if 'generalcode' in entities else '',
+        'raw_message': normalize_message(message).raw
+    }
+
 def extract_description(message: str) -> str:
     """Extract transaction description from SMS"""
     patterns = [
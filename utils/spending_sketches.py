@@ -0,0 +1,351 @@
+import pandas as pd
+import numpy as np
+import math
+from typing import Dict, Iterable, List, Optional, Tuple
+from utils.deduplication import drop_flagged_duplicates
+
+# Relative error of quantile estimates (DDSketch alpha)
+QUANTILE_RELATIVE_ACCURACY = 0.01
+# Upper bound on quantile buckets; the lowest buckets are collapsed beyond it
+QUANTILE_MAX_BUCKETS = 2048
+# HyperLogLog registers = 2 ** precision; standard error ~ 1.04 / sqrt(registers)
+DISTINCT_PRECISION = 12
+# Counters kept by the heavy-hitter sketch
+HEAVY_HITTER_COUNTERS = 64
+
+
+class QuantileSketch:
+    """
+    DDSketch-style quantile sketch over non-negative amounts
+
+    Values are counted in logarithmic buckets, so any quantile estimate is
+    within relative_accuracy of the true value (1% by default) as long as no
+    buckets were collapsed; collapsing only affects the lowest quantiles.
+    Count, mean, variance, min and max are tracked exactly. Sketches merge by
+    adding bucket counts.
+    """
+
+    def __init__(self, relative_accuracy: float = QUANTILE_RELATIVE_ACCURACY,
+                 max_buckets: int = QUANTILE_MAX_BUCKETS):
+        self.relative_accuracy = relative_accuracy
+        self.max_buckets = max_buckets
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, values: Iterable[float]) -> None:
+        values = np.asarray(values, dtype=float)
+        values = values[np.isfinite(values)]
+        if not len(values):
+            return
+
+        # Combine batch moments with the running ones (Chan et al.)
+        n = len(values)
+        batch_mean = float(values.mean())
+        batch_m2 = float(((values - batch_mean) ** 2).sum())
+        self._combine_moments(n, batch_mean, batch_m2)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+        positive = values[values > 0]
+        self.zero_count += n - len(positive)
+        if len(positive):
+            indexes = np.ceil(np.log(positive) / self._log_gamma).astype(np.int64)
+            keys, counts = np.unique(indexes, return_counts=True)
+            for key, count in zip(keys.tolist(), counts.tolist()):
+                self.buckets[key] = self.buckets.get(key, 0) + count
+            self._collapse()
+
+    def merge(self, other: 'QuantileSketch') -> None:
+        if other.gamma != self.gamma:
+            raise ValueError("Cannot merge quantile sketches with different accuracy")
+        if not other.count:
+            return
+        self._combine_moments(other.count, other.mean, other.m2)
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.zero_count += other.zero_count
+        for key, count in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + count
+        self._collapse()
+
+    def copy(self) -> 'QuantileSketch':
+        sketch = QuantileSketch(self.relative_accuracy, self.max_buckets)
+        sketch.merge(self)
+        return sketch
+
+    def _combine_moments(self, n: int, mean: float, m2: float) -> None:
+        total = self.count + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += m2 + delta * delta * self.count * n / total
+        self.count = total
+
+    def _collapse(self) -> None:
+        if len(self.buckets) <= self.max_buckets:
+            return
+        keys = sorted(self.buckets)
+        excess = keys[:len(keys) - self.max_buckets + 1]
+        target = excess[-1]
+        self.buckets[target] = sum(self.buckets.pop(key) for key in excess[:-1]) + self.buckets[target]
+
+    @property
+    def total(self) -> float:
+        return self.mean * self.count
+
+    @property
+    def std(self) -> float:
+        """
+        Sample standard deviation, matching pandas' Series.std()
+        """
+        if self.count < 2:
+            return float('nan')
+        return math.sqrt(max(self.m2 / (self.count - 1), 0.0))
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        if rank < self.zero_count:
+            return 0.0
+
+        seen = self.zero_count
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if seen > rank:
+                estimate = 2 * self.gamma ** key / (self.gamma + 1)
+                return min(max(estimate, self.min), self.max)
+        return self.max
+
+
+class DistinctCounter:
+    """
+    HyperLogLog distinct counter
+
+    Uses 2 ** precision one-byte registers (4 KB by default) with a standard
+    error of about 1.04 / sqrt(2 ** precision), i.e. ~1.6%; small cardinalities
+    fall back to linear counting and are close to exact. Merging takes the
+    register-wise maximum.
+    """
+
+    def __init__(self, precision: int = DISTINCT_PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def add(self, values: Iterable) -> None:
+        values = pd.Series(values, dtype='object').dropna().astype(str)
+        if values.empty:
+            return
+        hashes = pd.util.hash_array(values.unique().astype(object))
+
+        width = 64 - self.precision
+        indexes = (hashes >> np.uint64(width)).astype(np.int64)
+        rest = hashes & np.uint64((1 << width) - 1)
+        # Position of the leftmost 1-bit within the remaining bits
+        bit_length = np.where(rest > 0, np.frexp(rest.astype(float))[1], 0)
+        ranks = (width - bit_length + 1).astype(np.uint8)
+        np.maximum.at(self.registers, indexes, ranks)
+
+    def merge(self, other: 'DistinctCounter') -> None:
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge distinct counters with different precision")
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def copy(self) -> 'DistinctCounter':
+        counter = DistinctCounter(self.precision)
+        counter.registers = self.registers.copy()
+        return counter
+
+    def estimate(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            return int(round(m * math.log(m / zeros)))
+        return int(round(raw))
+
+
+class HeavyHitters:
+    """
+    Weighted Misra-Gries heavy-hitter sketch
+
+    Keeps at most `counters` items. Each estimate undercounts the true weight
+    by at most `error`, which never exceeds total_weight / (counters + 1), so
+    every item holding more than that share is guaranteed to be kept.
+    Merging adds counters and prunes back to size.
+    """
+
+    def __init__(self, counters: int = HEAVY_HITTER_COUNTERS):
+        self.counters = counters
+        self.items: Dict[str, float] = {}
+        self.error = 0.0
+        self.total_weight = 0.0
+
+    def add(self, items: Iterable, weights: Optional[Iterable[float]] = None) -> None:
+        items = pd.Series(items, dtype='object').astype(str)
+        weights = pd.Series(1.0, index=items.index) if weights is None \
+            else pd.Series(np.asarray(weights, dtype=float), index=items.index)
+        # Collapse the batch to one weight per item first (an exact summary)
+        batch = weights.groupby(items.to_numpy()).sum()
+        for item, weight in batch.items():
+            self.items[item] = self.items.get(item, 0.0) + float(weight)
+        self.total_weight += float(batch.sum())
+        self._prune()
+
+    def merge(self, other: 'HeavyHitters') -> None:
+        for item, weight in other.items.items():
+            self.items[item] = self.items.get(item, 0.0) + weight
+        self.error += other.error
+        self.total_weight += other.total_weight
+        self._prune()
+
+    def copy(self) -> 'HeavyHitters':
+        sketch = HeavyHitters(self.counters)
+        sketch.merge(self)
+        return sketch
+
+    def _prune(self) -> None:
+        if len(self.items) <= self.counters:
+            return
+        cutoff = sorted(self.items.values(), reverse=True)[self.counters]
+        self.error += cutoff
+        self.items = {item: weight - cutoff for item, weight in self.items.items() if weight > cutoff}
+
+    def top(self, n: int = 10) -> List[Tuple[str, float]]:
+        return sorted(self.items.items(), key=lambda item: item[1], reverse=True)[:n]
+
+
+class MonthPartition:
+    """
+    Sketches for the transactions of one calendar month
+    """
+
+    def __init__(self):
+        self.debits = QuantileSketch()
+        self.debits_by_category: Dict[str, QuantileSketch] = {}
+        self.debits_by_weekday: Dict[str, QuantileSketch] = {}
+        self.amounts_by_account: Dict[str, QuantileSketch] = {}
+        self.debit_count_by_account: Dict[str, int] = {}
+        self.merchants = DistinctCounter()
+        self.upi_ids = DistinctCounter()
+        self.top_merchants = HeavyHitters()
+
+    def add(self, df: pd.DataFrame) -> None:
+        amounts = pd.to_numeric(df['amount'], errors='coerce').fillna(0)
+        debit = (df['type'] == 'debit').to_numpy(dtype=bool, na_value=False) if 'type' in df.columns \
+            else np.zeros(len(df), dtype=bool)
+        debits = df.loc[debit].assign(amount=amounts[debit])
+
+        self.debits.add(debits['amount'])
+        _add_grouped(self.debits_by_category, debits, 'category')
+        if 'date' in debits.columns:
+            _add_grouped(self.debits_by_weekday, debits.assign(weekday=debits['date'].dt.day_name()), 'weekday')
+
+        if 'account_type' in df.columns:
+            _add_grouped(self.amounts_by_account, df.assign(amount=amounts), 'account_type')
+            for account, count in debits['account_type'].value_counts().items():
+                self.debit_count_by_account[account] = self.debit_count_by_account.get(account, 0) + int(count)
+
+        if 'description' in debits.columns:
+            self.merchants.add(debits['description'])
+            self.top_merchants.add(debits['description'], debits['amount'])
+        if 'upi_id' in df.columns:
+            self.upi_ids.add(df['upi_id'].replace('', np.nan))
+
+    def merge(self, other: 'MonthPartition') -> None:
+        self.debits.merge(other.debits)
+        for mine, theirs in ((self.debits_by_category, other.debits_by_category),
+                             (self.debits_by_weekday, other.debits_by_weekday),
+                             (self.amounts_by_account, other.amounts_by_account)):
+            for key, sketch in theirs.items():
+                if key in mine:
+                    mine[key].merge(sketch)
+                else:
+                    mine[key] = sketch.copy()
+        for account, count in other.debit_count_by_account.items():
+            self.debit_count_by_account[account] = self.debit_count_by_account.get(account, 0) + count
+        self.merchants.merge(other.merchants)
+        self.upi_ids.merge(other.upi_ids)
+        self.top_merchants.merge(other.top_merchants)
+
+    def copy(self) -> 'MonthPartition':
+        partition = MonthPartition()
+        partition.merge(self)
+        return partition
+
+
+class SpendingSketches:
+    """
+    Month-partitioned sketches of the transaction history
+
+    Memory per month is bounded by the sketch sizes rather than the number of
+    transactions. Queries merge the partitions in range, so aggregates over
+    years of history (or over several users' sketches) cost a few merges.
+    Partitions are never modified once published; with_rows() copies only
+    the months it touches.
+    """
+
+    def __init__(self, partitions: Optional[Dict[str, MonthPartition]] = None):
+        self.partitions: Dict[str, MonthPartition] = dict(partitions or {})
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> 'SpendingSketches':
+        return cls().with_rows(df)
+
+    def with_rows(self, df: pd.DataFrame) -> 'SpendingSketches':
+        """
+        New sketches with the transactions in df added
+        """
+        partitions = dict(self.partitions)
+        if df.empty or 'date' not in df.columns:
+            return SpendingSketches(partitions)
+
+        df = drop_flagged_duplicates(df)
+        df = df.assign(date=pd.to_datetime(df['date'], errors='coerce')).dropna(subset=['date'])
+        for month, rows in df.groupby(df['date'].dt.strftime('%Y-%m')):
+            partition = partitions[month].copy() if month in partitions else MonthPartition()
+            partition.add(rows)
+            partitions[month] = partition
+        return SpendingSketches(partitions)
+
+    def merge(self, other: 'SpendingSketches') -> 'SpendingSketches':
+        """
+        Combined sketches, e.g. across users
+        """
+        partitions = dict(self.partitions)
+        for month, partition in other.partitions.items():
+            if month in partitions:
+                combined = partitions[month].copy()
+                combined.merge(partition)
+                partitions[month] = combined
+            else:
+                partitions[month] = partition
+        return SpendingSketches(partitions)
+
+    @property
+    def months(self) -> List[str]:
+        return sorted(self.partitions)
+
+    def query(self, start: Optional[str] = None, end: Optional[str] = None) -> MonthPartition:
+        """
+        Merge the partitions for months in [start, end] ('YYYY-MM', inclusive)
+        """
+        merged = MonthPartition()
+        for month in self.months:
+            if (start is None or month >= start) and (end is None or month <= end):
+                merged.merge(self.partitions[month])
+        return merged
+
+
+def _add_grouped(sketches: Dict[str, QuantileSketch], df: pd.DataFrame, column: str) -> None:
+    if column not in df.columns:
+        return
+    for key, amounts in df.groupby(column)['amount']:
+        sketches.setdefault(key, QuantileSketch()).add(amounts)
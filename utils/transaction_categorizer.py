@@ -1,7 +1,13 @@
 import pandas as pd
-from typing import Dict
-import re
+from typing import Dict, Union
 from models.category_patterns import CATEGORY_PATTERNS
+from models.message_normalizer import NormalizedMessage, NormalizedPattern, normalize_message
+
+# Category patterns compiled once for matching against normalized text
+_COMPILED_CATEGORIES = [
+    (category, [NormalizedPattern(pattern) for pattern in patterns])
+    for category, patterns in CATEGORY_PATTERNS.items()
+]
 
 def categorize_transactions(df: pd.DataFrame) -> pd.DataFrame:
     """
@@ -11,15 +17,15 @@ def categorize_transactions(df: pd.DataFrame) -> pd.DataFrame:
     df['category'] = df['description'].apply(categorize_transaction)
     return df
 
-def categorize_transaction(description: str) -> str:
+def categorize_transaction(description: Union[str, NormalizedMessage]) -> str:
     """
     Categorize a single transaction based on its description
     """
-    description = description.lower()
-    
-    for category, patterns in CATEGORY_PATTERNS.items():
+    description = normalize_message(description)
+
+    for category, patterns in _COMPILED_CATEGORIES:
         for pattern in patterns:
-            if re.search(pattern, description, re.IGNORECASE):
+            if pattern.search(description):
                 return category
     
     return "Others"
@@ -0,0 +1,318 @@
+import pandas as pd
+import numpy as np
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional
+from utils.range_query import RangeQueryEngine
+from utils.spending_sketches import SpendingSketches
+from utils.balance_ledger import BalanceLedger
+from utils.data_manager import load_data, append_data, lock_store
+
+# Number of rows inspected per step when paging through filtered history
+FILTER_SCAN_BLOCK = 256
+# Filter combinations whose matched positions are cached per snapshot
+FILTER_CACHE_SIZE = 32
+
+
+class StoreSnapshot:
+    """
+    Immutable view of the store at one version, safe to share across sessions
+
+    Writers never modify a snapshot; they build the next one and swap it in,
+    so readers holding an older snapshot keep a consistent view without copying.
+    """
+
+    def __init__(self, df: pd.DataFrame, order: np.ndarray, sorted_dates: np.ndarray, version: int,
+                 sketches: Optional[SpendingSketches] = None):
+        self._df = df
+        self._order = order
+        self._sorted_dates = sorted_dates
+        self.version = version
+        self._range_engine = None
+        self._sketches = sketches
+        self._ledger = None
+        self._engine_lock = threading.Lock()
+        # filter key -> [matched positions newest first, rows scanned so far]
+        self._filter_cache: 'OrderedDict[Hashable, list]' = OrderedDict()
+        self._filter_lock = threading.Lock()
+
+        # Readers share these buffers, so refuse in-place writes to them
+        self._order.setflags(write=False)
+        self._sorted_dates.setflags(write=False)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, version: int = 0) -> 'StoreSnapshot':
+        df = df.reset_index(drop=True)
+        dates = _to_datetime64(df)
+        # Row positions sorted by date (oldest first) and the matching dates
+        order = np.argsort(dates, kind='stable')
+        return cls(df, order, dates[order], version)
+
+    @property
+    def data(self) -> pd.DataFrame:
+        """
+        Full transaction frame in insertion order; treat as read-only
+        """
+        return self._df
+
+    def __len__(self) -> int:
+        return len(self._df)
+
+    def with_rows(self, new_rows: pd.DataFrame) -> 'StoreSnapshot':
+        """
+        Next snapshot with rows appended and merged into the date index without a full re-sort
+        """
+        new_rows = new_rows.reset_index(drop=True)
+        start = len(self._df)
+
+        new_dates = _to_datetime64(new_rows)
+        new_order = np.argsort(new_dates, kind='stable')
+        new_sorted = new_dates[new_order]
+
+        # Insert after equal dates so that later uploads rank as more recent
+        positions = np.searchsorted(self._sorted_dates, new_sorted, side='right')
+        order = np.insert(self._order, positions, new_order + start)
+        sorted_dates = np.insert(self._sorted_dates, positions, new_sorted)
+
+        # Carry sketches forward incrementally once they have been built
+        sketches = self._sketches.with_rows(new_rows) if self._sketches is not None else None
+
+        df = pd.concat([self._df, new_rows], ignore_index=True)
+        return StoreSnapshot(df, order, sorted_dates, self.version + 1, sketches)
+
+    def range_queries(self) -> RangeQueryEngine:
+        """
+        Prefix-sum engine for date range queries, built once per snapshot
+        """
+        with self._engine_lock:
+            if self._range_engine is None:
+                self._range_engine = RangeQueryEngine(self._df)
+            return self._range_engine
+
+    def balance_ledger(self) -> BalanceLedger:
+        """
+        Per-account reported balances for as-of lookups, built once per snapshot
+        """
+        with self._engine_lock:
+            if self._ledger is None:
+                self._ledger = BalanceLedger(self._df)
+            return self._ledger
+
+    def spending_sketches(self) -> SpendingSketches:
+        """
+        Month-partitioned sketches for approximate analytics, built once and then extended per append
+        """
+        with self._engine_lock:
+            if self._sketches is None:
+                self._sketches = SpendingSketches.from_frame(self._df)
+            return self._sketches
+
+    def rows_near(self, dates, tolerance: pd.Timedelta) -> pd.DataFrame:
+        """
+        Rows dated within tolerance of any of the given dates, in insertion order
+
+        Each date is a binary search on the date index; overlapping windows
+        are merged so every matching row is read once.
+        """
+        dates = pd.to_datetime(pd.Series(dates), errors='coerce').dropna()
+        if dates.empty or not len(self._df):
+            return self._df.iloc[0:0]
+        dates = np.sort(dates.to_numpy(dtype='datetime64[ns]'))
+        tolerance = np.timedelta64(pd.Timedelta(tolerance).value, 'ns')
+
+        starts = np.searchsorted(self._sorted_dates, dates - tolerance, side='left')
+        ends = np.maximum.accumulate(np.searchsorted(self._sorted_dates, dates + tolerance, side='right'))
+        first = np.concatenate(([True], starts[1:] > ends[:-1]))
+        last = np.concatenate((first[1:], [True]))
+        positions = np.concatenate([self._order[a:b] for a, b in zip(starts[first], ends[last])])
+        return self._df.iloc[np.sort(positions)]
+
+    def recent(self, offset: int = 0, limit: int = 10,
+               filters: Optional[Dict] = None) -> pd.DataFrame:
+        """
+        Return a page of transactions ordered from newest to oldest
+
+        filters maps column names to a single value or a list of accepted values.
+        """
+        offset = max(int(offset), 0)
+        limit = max(int(limit), 0)
+        newest_first = self._order[::-1]
+
+        if not filters:
+            return self._df.iloc[newest_first[offset:offset + limit]]
+
+        wanted = offset + limit
+        matches = self._filtered_positions(filters, wanted)
+        return self._df.iloc[matches[offset:wanted]]
+
+    def _filtered_positions(self, filters: Dict, wanted: int) -> np.ndarray:
+        """
+        Newest-first positions of rows matching filters, at least `wanted` of them if they exist
+
+        Matches found so far are cached per filter combination, so paging
+        only scans rows beyond the furthest page served for those filters.
+        """
+        key = _filter_key(filters)
+        with self._filter_lock:
+            entry = self._filter_cache.get(key)
+            if entry is None:
+                entry = [np.empty(0, dtype=self._order.dtype), 0]
+                self._filter_cache[key] = entry
+                if len(self._filter_cache) > FILTER_CACHE_SIZE:
+                    self._filter_cache.popitem(last=False)
+            else:
+                self._filter_cache.move_to_end(key)
+
+            matches, scanned = entry
+            if len(matches) >= wanted or scanned >= len(self._order):
+                return matches
+
+            # Walk the index from the last scanned row and stop as soon as the page is full
+            newest_first = self._order[::-1]
+            block = max((wanted - len(matches)) * 4, FILTER_SCAN_BLOCK)
+            hits = [matches]
+            found = len(matches)
+            while scanned < len(newest_first) and found < wanted:
+                positions = newest_first[scanned:scanned + block]
+                mask = _filter_mask(self._df.iloc[positions], filters)
+                hits.append(positions[mask])
+                found += int(mask.sum())
+                scanned += len(positions)
+
+            entry[0] = np.concatenate(hits)
+            entry[1] = scanned
+            return entry[0]
+
+
+class TransactionStore:
+    """
+    Transaction store shared by every session in the process
+
+    Reads go through snapshot(), which returns the current immutable
+    StoreSnapshot without copying. Writes are serialized by a lock, persisted,
+    and publish a new snapshot with the version number bumped.
+    """
+
+    def __init__(self, df: pd.DataFrame,
+                 persist: Optional[Callable[[pd.DataFrame, pd.DataFrame], None]] = None):
+        self._snapshot = StoreSnapshot.from_frame(df)
+        self._persist = persist
+        self._write_lock = threading.Lock()
+
+    def snapshot(self) -> StoreSnapshot:
+        return self._snapshot
+
+    @property
+    def version(self) -> int:
+        return self._snapshot.version
+
+    @property
+    def data(self) -> pd.DataFrame:
+        return self._snapshot.data
+
+    def __len__(self) -> int:
+        return len(self._snapshot)
+
+    def append(self, new_rows: pd.DataFrame) -> StoreSnapshot:
+        """
+        Append transactions, persist them and publish the next snapshot
+        """
+        with self._write_lock:
+            current = self._snapshot
+            if new_rows.empty:
+                return current
+
+            updated = current.with_rows(new_rows)
+            if self._persist is not None:
+                self._persist(updated.data, new_rows)
+            self._snapshot = updated
+            return updated
+
+    def replace_prefix(self, base: StoreSnapshot, rows: pd.DataFrame) -> StoreSnapshot:
+        """
+        Replace the rows that existed in base, keeping anything appended since
+
+        Used to publish rewritten rows (e.g. a re-parse) computed from an older
+        snapshot; the store is append-only, so later rows follow base's rows.
+        """
+        if len(rows) != len(base):
+            raise ValueError("Replacement must have one row per row of the base snapshot")
+
+        with self._write_lock:
+            current = self._snapshot
+            appended = current.data.iloc[len(base):]
+            df = pd.concat([rows, appended], ignore_index=True) if len(appended) else rows
+            updated = StoreSnapshot.from_frame(df, current.version + 1)
+            if self._persist is not None:
+                self._persist(updated.data, None)
+            self._snapshot = updated
+            return updated
+
+    def range_queries(self) -> RangeQueryEngine:
+        return self._snapshot.range_queries()
+
+    def recent(self, offset: int = 0, limit: int = 10,
+               filters: Optional[Dict] = None) -> pd.DataFrame:
+        return self._snapshot.recent(offset, limit, filters)
+
+
+_shared_store: Optional[TransactionStore] = None
+_shared_store_lock = threading.Lock()
+_store_file_lock = None
+
+
+def get_shared_store() -> TransactionStore:
+    """
+    Process-wide store, loaded from disk on first use
+
+    The process keeps the store file lock for its lifetime, so offline tools
+    (python -m utils.reparse) refuse to rewrite data it would overwrite.
+    """
+    global _shared_store, _store_file_lock
+    with _shared_store_lock:
+        if _shared_store is None:
+            _store_file_lock = lock_store()
+            if _store_file_lock is None:
+                print("Warning: another process holds the transaction store lock; its writes may be lost")
+            _shared_store = TransactionStore(load_data(), persist=append_data)
+        return _shared_store
+
+
+def _to_datetime64(df: pd.DataFrame) -> np.ndarray:
+    """
+    Convert the date column to a datetime64 array (NaT for missing values)
+    """
+    if 'date' not in df.columns:
+        return np.full(len(df), np.datetime64('NaT'), dtype='datetime64[ns]')
+    dates = pd.to_datetime(df['date'], errors='coerce')
+    return dates.to_numpy(dtype='datetime64[ns]')
+
+
+def _filter_key(filters: Dict) -> Hashable:
+    """
+    Hashable, order-independent key for a filter mapping
+    """
+    items = []
+    for column, value in filters.items():
+        if isinstance(value, (list, tuple, set)):
+            value = ('in', tuple(sorted(map(repr, value))))
+        else:
+            value = ('eq', repr(value))
+        items.append((column, value))
+    return tuple(sorted(items))
+
+
+def _filter_mask(rows: pd.DataFrame, filters: Dict) -> np.ndarray:
+    """
+    Build a boolean mask for rows matching every filter
+    """
+    mask = np.ones(len(rows), dtype=bool)
+    for column, value in filters.items():
+        if column not in rows.columns:
+            return np.zeros(len(rows), dtype=bool)
+        if isinstance(value, (list, tuple, set)):
+            mask &= rows[column].isin(list(value)).to_numpy(dtype=bool, na_value=False)
+        else:
+            # Arrow-backed columns compare to nullable booleans; missing values never match
+            mask &= (rows[column] == value).to_numpy(dtype=bool, na_value=False)
+    return mask
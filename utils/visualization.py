@@ -3,6 +3,7 @@ import plotly.graph_objects as go
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
+from utils.deduplication import drop_flagged_duplicates
 
 def create_cashflow_chart(df: pd.DataFrame) -> go.Figure:
     """
@@ -22,7 +23,8 @@ def create_cashflow_chart(df: pd.DataFrame) -> go.Figure:
         return fig
 
     # Calculate daily net cash flow
-    df['date'] = pd.to_datetime(df['date'])
+    df = df.assign(date=pd.to_datetime(df['date']))
+    df = drop_flagged_duplicates(df)
     daily_flow = df.groupby(['date', 'type'])['amount'].sum().unstack(fill_value=0)
 
     # Ensure credit and debit columns exist
@@ -90,7 +92,8 @@ def create_investment_chart(df: pd.DataFrame) -> go.Figure:
         return fig
 
     # Filter investment transactions
-    investments = df[df['category'] == 'Investments'].copy()
+    investments = drop_flagged_duplicates(df)
+    investments = investments[investments['category'] == 'Investments'].copy()
     if investments.empty:
         fig = go.Figure()
         fig.add_annotation(